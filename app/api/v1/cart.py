@@ -1,38 +1,55 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from app.config.database import get_db
+from app.config.database import get_db, get_user_read_db
 from app.config.firebase_auth import verify_firebase_token
 from app.services.cart_service import CartService
-from app.schemas.cart import CartAdd, CartUpdate, CartItemOut
+from app.schemas.cart import CartAdd, CartUpdate, CartBatch, CartItemOut
+from app.core.http_cache import conditional_response, make_etag, PRIVATE_CACHE_CONTROL
+from app.core.query_budget import query_budget
+from app.core.serialization import RowSerializer
 
 router = APIRouter(prefix="/cart", tags=["Cart"])
 
+# CartService rows are already in CartItemOut's field order
+cart_item_serializer = RowSerializer(CartItemOut)
+
+
+# Map a (id, product_id, quantity, name, price, image_url) row from CartService straight into the schema
+def to_cart_item_out(row) -> CartItemOut:
+    item_id, product_id, quantity, name, price, image_url = row
+    return CartItemOut(
+        id=item_id,
+        product_id=product_id,
+        quantity=quantity,
+        product_name=name,
+        product_price=price,
+        product_image=image_url
+    )
+
 
 @router.get(
     "/",
     response_model=List[CartItemOut],
     summary="Get cart items",
-    description="Returns all items in the authenticated user's cart with product details."
+    description="Returns all items in the authenticated user's cart with product details. "
+                "Supports If-None-Match; an unchanged cart returns 304 Not Modified."
 )
+@query_budget(1)
 async def get_cart(
+    request: Request,
     firebase_uid: str = Depends(verify_firebase_token),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_user_read_db)
 ):
     try:
-        items = CartService.get_cart(db, firebase_uid)
-
-        return [
-            CartItemOut(
-                id=item.id,
-                product_id=item.product_id,
-                quantity=item.quantity,
-                product_name=item.product.name,
-                product_price=item.product.price,
-                product_image=item.product.image_url
-            )
-            for item in items
-        ]
+        rows = [tuple(row) for row in await CartService.get_cart(db, firebase_uid)]
+
+        return conditional_response(
+            request,
+            make_etag(rows),
+            PRIVATE_CACHE_CONTROL,
+            lambda: cart_item_serializer.dump_rows(rows)
+        )
     except Exception:
         raise HTTPException(
             status_code=500,
@@ -46,29 +63,23 @@ async def get_cart(
     summary="Add to cart",
     description="Adds a product to the user's cart. If the product is already in the cart, the quantity is increased."
 )
+@query_budget(2)
 async def add_to_cart(
     cart_data: CartAdd,
     firebase_uid: str = Depends(verify_firebase_token),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     try:
-        item = CartService.add_to_cart(db, firebase_uid, cart_data.product_id, cart_data.quantity)
+        item = await CartService.add_to_cart(db, firebase_uid, cart_data.product_id, cart_data.quantity)
 
         if not item:
             raise HTTPException(status_code=404, detail="Product not found")
 
-        return CartItemOut(
-            id=item.id,
-            product_id=item.product_id,
-            quantity=item.quantity,
-            product_name=item.product.name,
-            product_price=item.product.price,
-            product_image=item.product.image_url
-        )
+        return to_cart_item_out(item)
     except HTTPException:
         raise
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=500,
             detail="Failed to add to cart"
@@ -81,30 +92,24 @@ async def add_to_cart(
     summary="Update cart item",
     description="Updates the quantity of a product in the user's cart."
 )
+@query_budget(2)
 async def update_cart_item(
     cart_data: CartUpdate,
     product_id: int,
     firebase_uid: str = Depends(verify_firebase_token),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     try:
-        item = CartService.update_cart_item(db, firebase_uid, product_id, cart_data.quantity)
+        item = await CartService.update_cart_item(db, firebase_uid, product_id, cart_data.quantity)
 
         if not item:
             raise HTTPException(status_code=404, detail="Item not found in cart")
 
-        return CartItemOut(
-            id=item.id,
-            product_id=item.product_id,
-            quantity=item.quantity,
-            product_name=item.product.name,
-            product_price=item.product.price,
-            product_image=item.product.image_url
-        )
+        return to_cart_item_out(item)
     except HTTPException:
         raise
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=500,
             detail="Failed to update cart item"
@@ -116,13 +121,14 @@ async def update_cart_item(
     summary="Remove from cart",
     description="Removes a product from the user's cart."
 )
+@query_budget(1)
 async def remove_from_cart(
     product_id: int,
     firebase_uid: str = Depends(verify_firebase_token),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     try:
-        removed = CartService.remove_from_cart(db, firebase_uid, product_id)
+        removed = await CartService.remove_from_cart(db, firebase_uid, product_id)
 
         if not removed:
             raise HTTPException(status_code=404, detail="Item not found in cart")
@@ -131,8 +137,34 @@ async def remove_from_cart(
     except HTTPException:
         raise
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=500,
             detail="Failed to remove from cart"
         )
+
+
+@router.post(
+    "/batch",
+    response_model=List[CartItemOut],
+    summary="Batch update cart",
+    description="Applies a list of add/set/remove operations to the user's cart in one transaction, in order, "
+                "and returns the resulting cart. If any product doesn't exist, nothing is changed."
+)
+@query_budget(5)
+async def batch_update_cart(
+    batch: CartBatch,
+    firebase_uid: str = Depends(verify_firebase_token),
+    db: AsyncSession = Depends(get_db)
+):
+    try:
+        rows = await CartService.apply_batch(db, firebase_uid, batch.operations)
+        return [to_cart_item_out(row) for row in rows]
+    except HTTPException:
+        raise
+    except Exception:
+        await db.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to update cart"
+        )
@@ -1,27 +1,55 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from app.config.database import get_db
-from app.config.firebase_auth import verify_firebase_token
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional
+from app.config.database import get_user_read_db
+from app.config.firebase_auth import verify_firebase_token, ADMIN_UIDS
 from app.services.order_service import OrderService
-from app.schemas.order import OrderOut
+from app.services.order_export import OrderExportService
+from app.schemas.order import OrderOut, OrderItemOut
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.core.http_cache import conditional_response, make_etag, PRIVATE_CACHE_CONTROL
+from app.core.query_budget import query_budget
+from app.core.serialization import RowSerializer
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
 
+order_serializer = RowSerializer(OrderOut, nested={"order_items": RowSerializer(OrderItemOut)})
+
+
+# Order items are never modified after checkout, so an order's id, status and total identify its content
+def order_etag(orders) -> str:
+    return make_etag([(order.id, order.status, order.total_amount) for order in orders])
+
 
 @router.get(
     "/",
     response_model=List[OrderOut],
     summary="Get user orders",
-    description="Returns all orders for the authenticated user, sorted by most recent first."
+    description="Returns one page of the authenticated user's orders, most recent first. "
+                "When more orders exist, the X-Next-Cursor response header holds the cursor for the next page. "
+                "Supports If-None-Match; an unchanged page returns 304 Not Modified."
 )
+@query_budget(2)
 async def get_orders(
+    request: Request,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page's X-Next-Cursor header"),
     firebase_uid: str = Depends(verify_firebase_token),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_user_read_db)
 ):
     try:
-        orders = OrderService.get_user_orders(db, firebase_uid)
-        return orders
+        orders, next_cursor = await OrderService.get_user_orders(db, firebase_uid, limit, cursor)
+        return conditional_response(
+            request,
+            order_etag(orders),
+            PRIVATE_CACHE_CONTROL,
+            lambda: order_serializer.dump_objects(orders),
+            {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
     except Exception:
         raise HTTPException(
             status_code=500,
@@ -29,20 +57,54 @@ async def get_orders(
         )
 
 
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+@router.get(
+    "/export",
+    summary="Export orders",
+    description="Streams all orders with their items and payment, oldest first, as CSV (one line per order item) "
+                "or NDJSON (one order per line). Optionally filtered by creation date range and status. Admin only."
+)
+@query_budget(1)
+async def export_orders(
+    file_format: Literal["csv", "ndjson"] = Query("ndjson", alias="format"),
+    created_from: Optional[datetime] = Query(None, description="Only orders created at or after this time"),
+    created_to: Optional[datetime] = Query(None, description="Only orders created before this time"),
+    status: Optional[str] = Query(None, description="Only orders with this status"),
+    firebase_uid: str = Depends(verify_firebase_token)
+):
+    if firebase_uid not in ADMIN_UIDS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    return StreamingResponse(
+        OrderExportService.stream_orders(file_format, created_from, created_to, status),
+        media_type=EXPORT_MEDIA_TYPES[file_format],
+        headers={"Content-Disposition": f'attachment; filename="orders.{file_format}"'}
+    )
+
+
 @router.get(
     "/{order_id}",
     response_model=OrderOut,
     summary="Get a single order",
     description="Returns a single order by ID. Only accessible by the order owner."
 )
+@query_budget(2)
 async def get_order(
     order_id: int,
+    request: Request,
     firebase_uid: str = Depends(verify_firebase_token),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_user_read_db)
 ):
-    order = OrderService.get_order_by_id(db, firebase_uid, order_id)
+    order = await OrderService.get_order_by_id(db, firebase_uid, order_id)
 
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
 
-    return order
+    return conditional_response(
+        request,
+        order_etag([order]),
+        PRIVATE_CACHE_CONTROL,
+        lambda: order_serializer.dump_object(order)
+    )
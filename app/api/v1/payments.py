@@ -1,11 +1,13 @@
 import os
-import stripe
 from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.config.database import get_db
 from app.config.firebase_auth import verify_firebase_token
+from app.config.stripe_sdk import get_stripe
 from app.services.payment_service import PaymentService
+from app.services.webhook_service import WebhookService, webhook_workers, HANDLED_EVENTS
 from app.schemas.order import CheckoutSessionOut
+from app.core.query_budget import query_budget
 
 router = APIRouter(prefix="/payments", tags=["Payments"])
 
@@ -16,17 +18,18 @@ router = APIRouter(prefix="/payments", tags=["Payments"])
     summary="Create Stripe Checkout session",
     description="Creates a Stripe Checkout session from the user's cart. Returns the checkout URL for client redirect."
 )
+@query_budget(1)
 async def create_checkout_session(
     firebase_uid: str = Depends(verify_firebase_token),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     try:
-        result = PaymentService.create_checkout_session(db, firebase_uid)
+        result = await PaymentService.create_checkout_session(db, firebase_uid)
         return result
     except HTTPException:
         raise
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=500,
             detail="Failed to create checkout session"
@@ -36,9 +39,11 @@ async def create_checkout_session(
 @router.post(
     "/webhook/stripe",
     summary="Stripe webhook",
-    description="Receives Stripe webhook events. Verifies the signature and processes checkout.session.completed events."
+    description="Receives Stripe webhook events. Verifies the signature and queues checkout.session.completed events "
+                "for background processing. Redelivered events are stored only once."
 )
-async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
+@query_budget(1)
+async def stripe_webhook(request: Request, db: AsyncSession = Depends(get_db)):
     payload = await request.body()
     sig_header = request.headers.get("stripe-signature")
     webhook_secret = os.getenv("STRIPE_WEBHOOK_SECRET")
@@ -49,6 +54,7 @@ async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
     if not webhook_secret:
         raise HTTPException(status_code=500, detail="Webhook secret not configured")
 
+    stripe = get_stripe()
     try:
         event = stripe.Webhook.construct_event(
             payload, sig_header, webhook_secret
@@ -58,16 +64,18 @@ async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
     except stripe.SignatureVerificationError:
         raise HTTPException(status_code=400, detail="Invalid signature")
 
-    # Handle the checkout.session.completed event
-    if event["type"] == "checkout.session.completed":
-        session = event["data"]["object"]
+    # Only persist the event here; the webhook workers fulfil it in the background.
+    # Acknowledging straight away keeps bursts from timing out and triggering Stripe retries.
+    if event["type"] in HANDLED_EVENTS:
         try:
-            PaymentService.handle_checkout_completed(db, session)
+            stored = await WebhookService.store_event(db, event["id"], event["type"], payload)
         except Exception:
-            db.rollback()
+            await db.rollback()
             raise HTTPException(
                 status_code=500,
-                detail="Failed to process webhook"
+                detail="Failed to store webhook event"
             )
+        if stored:
+            webhook_workers.notify()
 
     return {"status": "ok"}
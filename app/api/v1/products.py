@@ -1,27 +1,52 @@
-import os
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from app.config.database import get_db
-from app.config.firebase_auth import verify_firebase_token
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional
+from app.config.database import get_db, get_read_db
+from app.config.firebase_auth import verify_firebase_token, ADMIN_UIDS
 from app.services.product_service import ProductService
+from app.services.catalog_cache import catalog_cache
+from app.services.search_service import SearchService
+from app.services.product_import import ProductImportService
 from app.schemas.product import ProductCreate, ProductUpdate, ProductOut
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.core.http_cache import conditional_response, CATALOG_CACHE_CONTROL
+from app.core.query_budget import query_budget
+from app.core.serialization import ORJSONResponse
 
 router = APIRouter(prefix="/products", tags=["Products"])
 
-ADMIN_UIDS = [uid.strip() for uid in os.getenv("ADMIN_UIDS", "").split(",") if uid.strip()]
-
 
 @router.get(
     "/",
     response_model=List[ProductOut],
-    summary="Get all products",
-    description="Returns a list of all available products. No authentication required."
+    summary="Get products",
+    description="Returns one page of products, newest first, optionally filtered by category, price range and stock. "
+                "When more products exist, the X-Next-Cursor response header holds the cursor for the next page. "
+                "No authentication required."
 )
-async def get_all_products(db: Session = Depends(get_db)):
+@query_budget(2)
+async def get_all_products(
+    request: Request,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page's X-Next-Cursor header"),
+    category: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    in_stock: bool = False,
+    db: AsyncSession = Depends(get_read_db)
+):
     try:
-        products = ProductService.get_all_products(db)
-        return products
+        # Served as pre-serialized (and pre-compressed) JSON from the catalog cache, only misses reach the database
+        page = await catalog_cache.get_products(
+            db, limit, cursor, category, min_price, max_price, in_stock
+        )
+        headers = {NEXT_CURSOR_HEADER: page.next_cursor} if page.next_cursor else None
+        return conditional_response(
+            request, page.etag, CATALOG_CACHE_CONTROL, lambda: page.body, headers, page.compressed
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
     except Exception:
         raise HTTPException(
             status_code=500,
@@ -29,22 +54,49 @@ async def get_all_products(db: Session = Depends(get_db)):
         )
 
 
+@router.get(
+    "/search",
+    response_model=List[ProductOut],
+    summary="Search products",
+    description="Full-text search over product name, category and description. "
+                "Results are ranked by relevance, name matches first. No authentication required."
+)
+@query_budget(2)
+async def search_products(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10000),
+    db: AsyncSession = Depends(get_read_db)
+):
+    try:
+        products = await SearchService.search_products(db, q, limit, offset)
+        return products
+    except Exception:
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to search products"
+        )
+
+
 @router.get(
     "/{product_id}",
     response_model=ProductOut,
     summary="Get a product by ID",
     description="Returns a single product by its ID. Returns 404 if the product does not exist."
 )
-async def get_product(product_id: int, db: Session = Depends(get_db)):
-    product = ProductService.get_product_by_id(db, product_id)
+@query_budget(2)
+async def get_product(product_id: int, request: Request, db: AsyncSession = Depends(get_read_db)):
+    cached = await catalog_cache.get_product(db, product_id)
 
-    if not product:
+    if not cached:
         raise HTTPException(
             status_code=404,
             detail="Product not found"
         )
 
-    return product
+    return conditional_response(
+        request, cached.etag, CATALOG_CACHE_CONTROL, lambda: cached.body, compressed=cached.compressed
+    )
 
 
 @router.post(
@@ -53,49 +105,99 @@ async def get_product(product_id: int, db: Session = Depends(get_db)):
     summary="Create a product",
     description="Creates a new product. Admin only."
 )
+@query_budget(5)
 async def create_product(
     product_data: ProductCreate,
     firebase_uid: str = Depends(verify_firebase_token),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     if firebase_uid not in ADMIN_UIDS:
         raise HTTPException(status_code=403, detail="Admin access required")
 
     try:
-        product = ProductService.create_product(db, product_data)
+        product = await ProductService.create_product(db, product_data)
+        await catalog_cache.publish(db)
         return product
+    except IntegrityError:
+        # products.sku is the table's only unique column besides the id
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Another product already has this SKU")
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=500,
             detail="Failed to create product"
         )
 
 
+@router.post(
+    "/import",
+    response_class=ORJSONResponse,
+    summary="Bulk import products",
+    description="Streams a CSV (with a header row) or NDJSON upload of products into the catalog in large batches. "
+                "Rows with a SKU update the existing product with that SKU. Invalid rows are skipped and "
+                "reported by row number. Admin only."
+)
+@query_budget(None)
+async def import_products(
+    request: Request,
+    file_format: Optional[Literal["csv", "ndjson"]] = Query(
+        None, alias="format", description="Upload format; defaults to csv for a text/csv Content-Type, else ndjson"
+    ),
+    firebase_uid: str = Depends(verify_firebase_token),
+    db: AsyncSession = Depends(get_db)
+):
+    if firebase_uid not in ADMIN_UIDS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    if file_format is None:
+        file_format = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+
+    try:
+        return await ProductImportService.import_products(db, request.stream(), file_format)
+    except UnicodeDecodeError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Upload must be UTF-8 encoded")
+    except Exception:
+        await db.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to import products"
+        )
+    finally:
+        # Batches commit as they go, so even a failed import may have changed the catalog
+        await catalog_cache.publish(db)
+
+
 @router.put(
     "/{product_id}",
     response_model=ProductOut,
     summary="Update a product",
     description="Updates an existing product. Only provided fields will be changed. Admin only."
 )
+@query_budget(6)
 async def update_product(
     product_id: int,
     product_data: ProductUpdate,
     firebase_uid: str = Depends(verify_firebase_token),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     if firebase_uid not in ADMIN_UIDS:
         raise HTTPException(status_code=403, detail="Admin access required")
 
     try:
-        product = ProductService.update_product(db, product_id, product_data)
+        product = await ProductService.update_product(db, product_id, product_data)
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
+        await catalog_cache.publish(db)
         return product
     except HTTPException:
         raise
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Another product already has this SKU")
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=500,
             detail="Failed to update product"
@@ -107,23 +209,25 @@ async def update_product(
     summary="Delete a product",
     description="Deletes a product by its ID. Admin only."
 )
+@query_budget(6)
 async def delete_product(
     product_id: int,
     firebase_uid: str = Depends(verify_firebase_token),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     if firebase_uid not in ADMIN_UIDS:
         raise HTTPException(status_code=403, detail="Admin access required")
 
     try:
-        deleted = ProductService.delete_product(db, product_id)
+        deleted = await ProductService.delete_product(db, product_id)
         if not deleted:
             raise HTTPException(status_code=404, detail="Product not found")
+        await catalog_cache.publish(db)
         return {"message": "Product deleted successfully"}
     except HTTPException:
         raise
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=500,
             detail="Failed to delete product"
@@ -0,0 +1,84 @@
+from datetime import date, datetime, timedelta, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app.config.database import get_read_db
+from app.config.firebase_auth import verify_firebase_token, ADMIN_UIDS
+from app.services.sales_rollup_service import SalesRollupService
+from app.schemas.sales import ProductSalesOut, CategorySalesOut
+from app.core.query_budget import query_budget
+
+router = APIRouter(prefix="/sales", tags=["Sales"])
+
+DEFAULT_REPORT_DAYS = 30
+MAX_REPORT_DAYS = 366
+
+
+# Resolve the report's inclusive UTC date range: the last DEFAULT_REPORT_DAYS days unless given
+def report_range(date_from: Optional[date], date_to: Optional[date]):
+    date_to = date_to or datetime.now(timezone.utc).date()
+    date_from = date_from or date_to - timedelta(days=DEFAULT_REPORT_DAYS - 1)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to")
+    if (date_to - date_from).days >= MAX_REPORT_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range is limited to {MAX_REPORT_DAYS} days")
+    return date_from, date_to
+
+
+@router.get(
+    "/products",
+    response_model=List[ProductSalesOut],
+    summary="Sales by product",
+    description="Units sold, revenue and order count per product over a UTC date range (both ends included, "
+                "default the last 30 days), best sellers by revenue first. Read from the daily sales rollups. Admin only."
+)
+@query_budget(1)
+async def get_product_sales(
+    date_from: Optional[date] = Query(None, description="First day of the range (UTC)"),
+    date_to: Optional[date] = Query(None, description="Last day of the range (UTC), default today"),
+    limit: int = Query(50, ge=1, le=500),
+    firebase_uid: str = Depends(verify_firebase_token),
+    db: AsyncSession = Depends(get_read_db)
+):
+    if firebase_uid not in ADMIN_UIDS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    date_from, date_to = report_range(date_from, date_to)
+    rows = await SalesRollupService.product_sales(db, date_from, date_to, limit)
+    return [
+        ProductSalesOut(product_id=row.product_id, units=row.units, revenue=round(row.revenue, 2), orders=row.orders)
+        for row in rows
+    ]
+
+
+@router.get(
+    "/categories",
+    response_model=List[CategorySalesOut],
+    summary="Daily sales by category",
+    description="Units sold, revenue and order count per category per day over a UTC date range (both ends "
+                "included, default the last 30 days), oldest day first. Days without sales are left out. "
+                "Read from the daily sales rollups. Admin only."
+)
+@query_budget(1)
+async def get_category_sales(
+    date_from: Optional[date] = Query(None, description="First day of the range (UTC)"),
+    date_to: Optional[date] = Query(None, description="Last day of the range (UTC), default today"),
+    category: Optional[str] = Query(None, description="Only this category"),
+    firebase_uid: str = Depends(verify_firebase_token),
+    db: AsyncSession = Depends(get_read_db)
+):
+    if firebase_uid not in ADMIN_UIDS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    date_from, date_to = report_range(date_from, date_to)
+    rows = await SalesRollupService.category_sales(db, date_from, date_to, category)
+    return [
+        CategorySalesOut(
+            day=row.day,
+            category=row.category or None,
+            units=row.units,
+            revenue=round(row.revenue, 2),
+            orders=row.orders
+        )
+        for row in rows
+    ]
@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.config.database import get_db
 from app.config.firebase_auth import verify_firebase_token_full
 from app.services.user_service import UserService
 from app.schemas.user import UserOut
+from app.core.query_budget import query_budget
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
@@ -14,9 +15,10 @@ router = APIRouter(prefix="/users", tags=["Users"])
     summary="Get or create current user",
     description="Verifies the Firebase token, extracts user info (uid, email, name), and returns the user from the database. Creates a new user if they don't exist yet."
 )
+@query_budget(3)
 async def get_or_create_user(
     decoded_token: dict = Depends(verify_firebase_token_full),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     uid = decoded_token.get("uid")
     email = decoded_token.get("email")
@@ -29,10 +31,10 @@ async def get_or_create_user(
         )
 
     try:
-        user = UserService.get_userdata(db, uid, name, email)
+        user = await UserService.get_userdata(db, uid, name, email)
         return user
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=500,
             detail="Failed to create or retrieve user"
@@ -0,0 +1,101 @@
+"""
+Operational commands, run from the repo root:
+
+    python -m app.cli create-schema
+    python -m app.cli backfill-inventory
+    python -m app.cli import-products catalog.csv [--format csv|ndjson] [--batch-size N]
+    python -m app.cli rebuild-sales-rollups [--since YYYY-MM-DD]
+"""
+import asyncio
+import argparse
+from datetime import date
+import app.models  # noqa: F401
+from app.config.database import AsyncSessionLocal, async_engine, Base
+from app.config.migrations import migrate
+from app.services.inventory_service import InventoryService
+from app.services.product_import import ProductImportService, IMPORT_FORMATS, IMPORT_BATCH_SIZE
+from app.services.sales_rollup_service import SalesRollupService
+
+
+async def create_schema(args):
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        applied = await conn.run_sync(migrate)
+    print("Created any missing tables and indexes")
+    for name in applied:
+        print(f"Applied migration {name}")
+
+
+async def backfill_inventory(args):
+    async with AsyncSessionLocal() as db:
+        migrated = await InventoryService.backfill_legacy_stock(db)
+    print(f"Moved stock of {migrated} products into stock shards")
+
+
+async def read_chunks(path: str, size: int = 1 << 20):
+    with open(path, "rb") as f:
+        while chunk := f.read(size):
+            yield chunk
+
+
+async def import_products(args):
+    file_format = args.format or ("csv" if args.path.lower().endswith(".csv") else "ndjson")
+    async with AsyncSessionLocal() as db:
+        report = await ProductImportService.import_products(
+            db, read_chunks(args.path), file_format, args.batch_size
+        )
+    for error in report["errors"]:
+        print(f"row {error['row']}: {error['error']}")
+    print(f"Imported {report['imported']} products, {report['failed']} rows failed")
+
+
+async def rebuild_sales_rollups(args):
+    async with AsyncSessionLocal() as db:
+        written = await SalesRollupService.rebuild(db, args.since)
+    scope = f"from {args.since.isoformat()} on" if args.since else "for all days"
+    print(f"Rebuilt sales rollups {scope}: {written} rows")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Elavid API maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser(
+        "create-schema",
+        help="Create missing tables and indexes and migrate existing tables; run once per deploy, workers no longer do it on boot"
+    ).set_defaults(handler=create_schema)
+
+    commands.add_parser(
+        "backfill-inventory",
+        help="Copy the legacy products.stock column into stock shards for products that have none"
+    ).set_defaults(handler=backfill_inventory)
+
+    importer = commands.add_parser(
+        "import-products",
+        help="Upsert products (by SKU) from a CSV or NDJSON file"
+    )
+    importer.add_argument("path", help="CSV with a header row, or one JSON object per line")
+    importer.add_argument("--format", choices=IMPORT_FORMATS, help="Defaults to csv for *.csv files, else ndjson")
+    importer.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE, help="Rows per INSERT and commit")
+    importer.set_defaults(handler=import_products)
+
+    rollups = commands.add_parser(
+        "rebuild-sales-rollups",
+        help="Recompute the daily product and category sales rollups from orders (backfill or repair)"
+    )
+    rollups.add_argument("--since", type=date.fromisoformat, help="Only rebuild days from this UTC date on")
+    rollups.set_defaults(handler=rebuild_sales_rollups)
+
+    args = parser.parse_args()
+
+    async def run():
+        try:
+            await args.handler(args)
+        finally:
+            await async_engine.dispose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
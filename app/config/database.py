@@ -1,6 +1,15 @@
 import os
-from sqlalchemy import create_engine
+import time
+import uuid
+from typing import Optional
+from fastapi import Depends, Request
+from sqlalchemy import create_engine, exc
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.pool import NullPool, QueuePool, AsyncAdaptedQueuePool
+from app.config.firebase_auth import verify_firebase_token
+from app.core.read_your_writes import note_write, reads_primary
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
@@ -8,14 +17,225 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
-engine = create_engine(DATABASE_URL)
+# Async drivers used by the request path, keyed by the sync URL scheme
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    scheme, sep, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+# ASYNC_DATABASE_URL can point the async engine at a different driver (e.g. postgresql+psycopg)
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or (DATABASE_URL and to_async_url(DATABASE_URL))
+
+
+def env_flag(name: str, default: str = "false") -> bool:
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes")
+
+
+# Connection pool sizing, per engine and per worker process: size each worker against Postgres' max_connections
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Replace connections older than this (seconds), before the server or a proxy drops them
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Test each connection on checkout so one left dead by a database restart is replaced instead of failing a request
+DB_POOL_PRE_PING = env_flag("DB_POOL_PRE_PING", "true")
+# Behind PgBouncer in transaction mode: PgBouncer does the pooling, and server-side prepared statements
+# can't be used because consecutive transactions may run on different server connections
+DB_PGBOUNCER = env_flag("DB_PGBOUNCER")
+
+
+class PoolWaitStats:
+    """How long checkouts waited for a pooled connection, including connecting a new one"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.timeouts = 0
+
+    def record(self, seconds: float):
+        self.checkouts += 1
+        self.wait_seconds += seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def stats(self):
+        return {
+            "checkouts": self.checkouts,
+            "wait_seconds_total": round(self.wait_seconds, 6),
+            "wait_seconds_max": round(self.max_wait_seconds, 6),
+            "timeouts": self.timeouts,
+        }
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records checkout wait times in its `waits`"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waits = PoolWaitStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.waits.timeouts += 1
+            raise
+        finally:
+            self.waits.record(time.perf_counter() - start)
+
+
+def engine_options(url: str, poolclass) -> dict:
+    if DB_PGBOUNCER:
+        options = {"poolclass": NullPool}
+        if url.startswith("postgresql+asyncpg"):
+            # No statement cache, and unique names for the statements asyncpg still prepares internally
+            options["connect_args"] = {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+            }
+        return options
+
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    # SQLite picks its own pool class, which may not take sizing arguments
+    if not url.startswith("sqlite"):
+        options.update(
+            poolclass=poolclass,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+    return options
+
+
+# Sync engine: schema creation, CLI scripts and anything that runs outside the event loop
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL, QueuePool))
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+# Async engine: every request handler awaits its queries through this one
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL, TimedAsyncQueuePool))
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+# Optional streaming replica for read-only routes; without one, reads use the primary too
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+if DATABASE_REPLICA_URL and DATABASE_REPLICA_URL.startswith("postgres://"):
+    DATABASE_REPLICA_URL = DATABASE_REPLICA_URL.replace("postgres://", "postgresql://", 1)
+ASYNC_DATABASE_REPLICA_URL = DATABASE_REPLICA_URL and to_async_url(DATABASE_REPLICA_URL)
+
+replica_engine = create_async_engine(
+    ASYNC_DATABASE_REPLICA_URL, **engine_options(ASYNC_DATABASE_REPLICA_URL, TimedAsyncQueuePool)
+) if ASYNC_DATABASE_REPLICA_URL else None
+ReplicaSessionLocal = async_sessionmaker(
+    bind=replica_engine or async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+# How long (seconds) after a write its reader keeps reading from the primary, covering replication lag
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+# Same after starting a checkout: the order and cart writes follow whenever Stripe's webhook is fulfilled,
+# by whichever worker claims it, so the window spans the time it usually takes to pay
+CHECKOUT_READ_YOUR_WRITES_SECONDS = float(os.getenv("CHECKOUT_READ_YOUR_WRITES_SECONDS", "900"))
+# Key for writes that change what everyone reads (products, stock), as opposed to one user's own data
+CATALOG_WRITES = "catalog"
+
 Base = declarative_base()
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+class RecentWrites:
+    """
+    Who wrote within the last `window` seconds, so their reads can skip a lagging replica.
+
+    Kept per process. A user's writes made during a request also reach the other workers
+    through the response's read-the-primary cookie (see app.core.read_your_writes).
+    """
+
+    def __init__(self, window: float):
+        self.window = window
+        self._until = {}
+
+    def mark(self, key: str, window: Optional[float] = None):
+        window = self.window if window is None else window
+        now = time.monotonic()
+        if len(self._until) > 10000:
+            self._until = {k: until for k, until in self._until.items() if until > now}
+        self._until[key] = max(self._until.get(key, 0), now + window)
+        if key != CATALOG_WRITES:
+            note_write(time.time() + window)
+
+    def recent(self, key: str) -> bool:
+        until = self._until.get(key)
+        return until is not None and until > time.monotonic()
+
+
+recent_writes = RecentWrites(READ_YOUR_WRITES_SECONDS)
+
+
+def read_session(key: Optional[str] = None, primary: bool = False) -> AsyncSession:
+    """Session for read-only work: the replica, unless `primary` is asked for or `key` wrote recently"""
+    if replica_engine is None or primary or (key is not None and recent_writes.recent(key)):
+        return AsyncSessionLocal()
+    return ReplicaSessionLocal()
+
+
+def pool_gauges(pool) -> dict:
+    gauges = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        gauges.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+        )
+    if isinstance(pool, TimedAsyncQueuePool):
+        gauges.update(pool.waits.stats())
+    return gauges
+
+
+def pool_stats() -> dict:
+    """Gauges of the async engines' pools, for sizing workers against the database's connection limit"""
+    stats = pool_gauges(async_engine.pool)
+    if replica_engine is not None:
+        stats["replica"] = pool_gauges(replica_engine.pool)
+    return stats
+
+
+# Read-write session on the primary
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# Read-only session for catalog routes; goes to the primary for a while after a catalog write
+async def get_read_db():
+    async with read_session(CATALOG_WRITES) as db:
+        yield db
+
+
+# Read-only session for a user's own data; goes to the primary for a while after that user's writes,
+# whichever worker made them
+async def get_user_read_db(request: Request, firebase_uid: str = Depends(verify_firebase_token)):
+    async with read_session(firebase_uid, primary=reads_primary(request.cookies)) as db:
         yield db
-    finally:
-        db.close()
+
+
+# INSERT supporting ON CONFLICT for the session's database (Postgres in production, SQLite in tests)
+def dialect_insert(db: AsyncSession, table):
+    if db.bind.dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
@@ -1,18 +1,266 @@
 import os
+import re
 import json
+import time
+import base64
+import asyncio
+import hashlib
+import logging
+import importlib
+import threading
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 from fastapi import Header, Depends, HTTPException
-import firebase_admin
-from firebase_admin import credentials, auth
+from app.core.metrics import TOKEN_VERIFY_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Public x509 certificates Google signs Firebase ID tokens with, keyed by key id
+GOOGLE_CERTS_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+
+# Firebase UIDs allowed to call the admin endpoints
+ADMIN_UIDS = [uid.strip() for uid in os.getenv("ADMIN_UIDS", "").split(",") if uid.strip()]
+
+
+class InvalidTokenError(ValueError):
+    pass
+
+
+class ExpiredTokenError(InvalidTokenError):
+    pass
+
+
+class TokenVerifier:
+    """
+    Verifies Firebase ID tokens against a locally held copy of the signing key set.
+
+    Keys are fetched once at startup and refreshed in a background thread before Google
+    rotates them, so requests never wait on the cert endpoint. Verification itself runs on
+    a bounded thread pool to keep the RSA work off the event loop.
+
+    For offline use, FIREBASE_KEYSET_FILE points at a JSON file of {key_id: PEM certificate}
+    (the same shape Google serves), FIREBASE_KEYSET_URL at a stub issuer's key endpoint, and
+    FIREBASE_TOKEN_ISSUER overrides the expected `iss` claim.
+    """
+
+    def __init__(self, max_workers: int = 4, min_refresh_interval: float = 60):
+        self.project_id = None
+        self.issuer = None
+        self.keyset_file = None
+        self.keyset_url = GOOGLE_CERTS_URL
+        self.min_refresh_interval = min_refresh_interval
+        self._certs = {}
+        self._refreshed_at = 0.0
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._refresher = None
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="token-verify")
+
+    def configure(self, project_id: str, keyset_file: Optional[str] = None, keyset_url: Optional[str] = None, issuer: Optional[str] = None):
+        self.project_id = project_id
+        self.keyset_file = keyset_file
+        self.keyset_url = keyset_url or GOOGLE_CERTS_URL
+        self.issuer = issuer or f"https://securetoken.google.com/{project_id}"
+
+    def start(self, **config):
+        """Load the key set and keep it fresh, fetching in the background so the boot never waits on Google"""
+        if config:
+            self.configure(**config)
+        # Import the JWT library (and cryptography) on a verification thread now, not on the first request
+        self._executor.submit(importlib.import_module, "google.auth.jwt")
+        if self.keyset_file:
+            self.refresh_keys()
+            return
+        if self._refresher is None:
+            self._refresher = threading.Thread(target=self._refresh_loop, name="token-keys", daemon=True)
+            self._refresher.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def refresh_keys(self) -> float:
+        """Reload the key set, returning how many seconds it may be cached for"""
+        with self._refresh_lock:
+            return self._load_keys()
+
+    def _load_keys(self) -> float:
+        # Callers hold _refresh_lock
+        if self.keyset_file:
+            with open(self.keyset_file) as f:
+                self._certs = json.load(f)
+            max_age = float("inf")
+        else:
+            with urllib.request.urlopen(self.keyset_url, timeout=10) as response:
+                self._certs = json.loads(response.read())
+                match = re.search(r"max-age=(\d+)", response.headers.get("Cache-Control", ""))
+                max_age = float(match.group(1)) if match else 3600.0
+        self._refreshed_at = time.monotonic()
+        return max_age
+
+    def _refresh_loop(self):
+        # Refresh at 90% of the advertised lifetime, retrying sooner if Google is unreachable.
+        # Until the first fetch lands, a token's unknown kid triggers the same fetch inline.
+        delay = 0
+        while not self._stop.wait(delay):
+            try:
+                max_age = self.refresh_keys()
+                delay = max(self.min_refresh_interval, max_age * 0.9)
+            except Exception:
+                logger.exception("Failed to refresh Firebase signing keys")
+                delay = self.min_refresh_interval
+
+    def _cert_for(self, kid: str) -> Optional[str]:
+        cert = self._certs.get(kid)
+        # Unknown key id: Google may have rotated keys early. Refresh, but not on every bad token.
+        if cert is None and time.monotonic() - self._refreshed_at > self.min_refresh_interval:
+            with self._refresh_lock:
+                # Threads that queued here behind another's refresh use its result instead of fetching again
+                if time.monotonic() - self._refreshed_at > self.min_refresh_interval:
+                    self._load_keys()
+            cert = self._certs.get(kid)
+        return cert
+
+    def verify(self, token: str) -> dict:
+        """Blocking verification, mirrors the checks firebase_admin.auth.verify_id_token makes"""
+        from google.auth import jwt
+
+        if self.project_id is None:
+            raise InvalidTokenError("Token verifier is not configured")
+
+        try:
+            header_segment = token.split(".")[0]
+            header = json.loads(base64.urlsafe_b64decode(header_segment + "=" * (-len(header_segment) % 4)))
+        except (ValueError, TypeError):
+            raise InvalidTokenError("Malformed token")
+
+        if header.get("alg") != "RS256":
+            raise InvalidTokenError("Token must be signed with RS256")
+
+        cert = self._cert_for(header.get("kid"))
+        if cert is None:
+            raise InvalidTokenError("Token signed with an unknown key")
+
+        try:
+            claims = jwt.decode(token, certs=cert, audience=self.project_id)
+        except ValueError as e:
+            if "expired" in str(e).lower():
+                raise ExpiredTokenError(str(e))
+            raise InvalidTokenError(str(e))
+
+        if claims.get("iss") != self.issuer:
+            raise InvalidTokenError("Token has an incorrect issuer")
+
+        subject = claims.get("sub")
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise InvalidTokenError("Token has an invalid subject")
+
+        claims["uid"] = subject
+        return claims
+
+    async def verify_async(self, token: str) -> dict:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.verify, token)
+
+
+token_verifier = TokenVerifier(max_workers=int(os.getenv("TOKEN_VERIFY_WORKERS", "4")))
 
 
 def initialize_firebase():
-    if not firebase_admin._apps:
-        firebase_json = os.getenv("FIREBASE_JSON")
-        if not firebase_json:
-            raise ValueError("FIREBASE_JSON environment variable not set")
-        cred = credentials.Certificate(json.loads(firebase_json))
-        firebase_admin.initialize_app(cred)
+    """
+    Configure Firebase ID token verification for this worker.
+
+    Tokens are verified in-process by token_verifier with google-auth, so the firebase_admin
+    SDK (and its Google API client) isn't needed at all.
+    """
+    firebase_json = os.getenv("FIREBASE_JSON")
+    if not firebase_json:
+        raise ValueError("FIREBASE_JSON environment variable not set")
+    service_account = json.loads(firebase_json)
+
+    token_verifier.start(
+        project_id=os.getenv("FIREBASE_PROJECT_ID") or service_account.get("project_id"),
+        keyset_file=os.getenv("FIREBASE_KEYSET_FILE"),
+        keyset_url=os.getenv("FIREBASE_KEYSET_URL"),
+        issuer=os.getenv("FIREBASE_TOKEN_ISSUER"),
+    )
+
+
+class TokenCache:
+    """
+    Bounded LRU cache of decoded Firebase ID tokens, keyed by a SHA-256 of the token.
+
+    Entries expire at the token's own `exp` claim, or after `max_ttl` seconds if that
+    comes first, so a cached token is never accepted past the point Firebase would reject it.
+    """
+
+    def __init__(self, max_size: int = 10000, max_ttl: float = 300):
+        self.max_size = max_size
+        self.max_ttl = max_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, decoded_token = entry
+            if expires_at > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return decoded_token
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, token: str, decoded_token: dict):
+        now = time.time()
+        expires_at = min(decoded_token.get("exp", now), now + self.max_ttl)
+        if expires_at <= now:
+            return
+        key = self._key(token)
+        self._entries[key] = (expires_at, decoded_token)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+token_cache = TokenCache(
+    max_size=int(os.getenv("TOKEN_CACHE_SIZE", "10000")),
+    max_ttl=float(os.getenv("TOKEN_CACHE_TTL", "300")),
+)
+
+
+async def decode_token(token: str) -> dict:
+    """
+    Verify a Firebase ID token, reusing the decoded claims if this worker has already verified it
+    """
+    decoded_token = token_cache.get(token)
+    if decoded_token is None:
+        start = time.perf_counter()
+        result = "invalid"
+        try:
+            decoded_token = await token_verifier.verify_async(token)
+            result = "valid"
+        except ExpiredTokenError:
+            result = "expired"
+            raise
+        finally:
+            TOKEN_VERIFY_SECONDS.observe(time.perf_counter() - start, result)
+        token_cache.put(token, decoded_token)
+    return decoded_token
 
 
 async def get_authorization_header(authorization: Optional[str] = Header(None, alias="Authorization")) -> str:
@@ -48,8 +296,8 @@ async def verify_firebase_token(authorization: str = Depends(get_authorization_h
         # Extract token from "Bearer <token>"
         token = authorization.split("Bearer ")[1].strip()
 
-        # Verify the token with Firebase
-        decoded_token = auth.verify_id_token(token)
+        # Verify the token with Firebase (cached per token until it expires)
+        decoded_token = await decode_token(token)
 
         # Return the user's Firebase UID
         return decoded_token["uid"]
@@ -59,15 +307,15 @@ async def verify_firebase_token(authorization: str = Depends(get_authorization_h
             status_code=401,
             detail="Invalid token format"
         )
-    except auth.InvalidIdTokenError:
+    except ExpiredTokenError:
         raise HTTPException(
             status_code=401,
-            detail="Invalid or expired token"
+            detail="Token has expired"
         )
-    except auth.ExpiredIdTokenError:
+    except InvalidTokenError:
         raise HTTPException(
             status_code=401,
-            detail="Token has expired"
+            detail="Invalid or expired token"
         )
     except Exception as e:
         raise HTTPException(
@@ -82,8 +330,8 @@ async def verify_firebase_token_full(authorization: str = Depends(get_authorizat
         # Extract token from "Bearer <token>"
         token = authorization.split("Bearer ")[1].strip()
 
-        # Verify the token with Firebase
-        decoded_token = auth.verify_id_token(token)
+        # Verify the token with Firebase (cached per token until it expires)
+        decoded_token = await decode_token(token)
 
         # Return the user's Firebase UID, name and email
         return decoded_token
@@ -93,15 +341,15 @@ async def verify_firebase_token_full(authorization: str = Depends(get_authorizat
             status_code=401,
             detail="Invalid token format"
         )
-    except auth.InvalidIdTokenError:
+    except ExpiredTokenError:
         raise HTTPException(
             status_code=401,
-            detail="Invalid or expired token"
+            detail="Token has expired"
         )
-    except auth.ExpiredIdTokenError:
+    except InvalidTokenError:
         raise HTTPException(
             status_code=401,
-            detail="Token has expired"
+            detail="Invalid or expired token"
         )
     except Exception as e:
         raise HTTPException(
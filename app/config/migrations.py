@@ -0,0 +1,115 @@
+"""
+Changes to existing tables, which create_all never makes: it only creates missing tables
+(and the indexes of the tables it creates).
+
+`python -m app.cli create-schema` runs create_all and then `migrate`. Every migration checks
+the live schema first and does nothing if it's already applied, so it's safe on every deploy.
+Each one runs in create-schema's transaction, given its sync connection.
+"""
+from sqlalchemy import inspect, select, update, delete, func, text
+from sqlalchemy.schema import AddConstraint
+from app.config.database import Base
+from app.models.cart import Cart
+from app.models.product import Product
+
+CART_UNIQUE = "uq_cart_user_id_product_id"
+PRODUCT_SKU_UNIQUE = "uq_products_sku"
+
+
+def merge_duplicate_cart_lines(conn):
+    """Fold each user's duplicate lines of a product into the oldest one, summing quantities"""
+    cart = Cart.__table__
+    kept, duplicate = cart.alias("kept"), cart.alias("duplicate")
+    first_lines = select(func.min(kept.c.id)).group_by(kept.c.user_id, kept.c.product_id)
+    total = (
+        select(func.sum(func.coalesce(duplicate.c.quantity, 1)))
+        .filter(duplicate.c.user_id == cart.c.user_id, duplicate.c.product_id == cart.c.product_id)
+        .scalar_subquery()
+    )
+    conn.execute(
+        update(cart)
+        .filter(cart.c.id.in_(first_lines.having(func.count() > 1)))
+        .values(quantity=total)
+    )
+    return conn.execute(delete(cart).filter(cart.c.id.not_in(first_lines))).rowcount
+
+
+def add_cart_unique_constraint(conn):
+    """One cart line per user and product, which the cart upserts' ON CONFLICT (user_id, product_id) needs"""
+    inspector = inspect(conn)
+    existing = {c["name"] for c in inspector.get_unique_constraints(Cart.__tablename__)}
+    existing |= {i["name"] for i in inspector.get_indexes(Cart.__tablename__) if i["unique"]}
+    if CART_UNIQUE in existing:
+        return False
+
+    if conn.dialect.name == "postgresql":
+        # Block cart writes until the constraint exists, so no new duplicate slips in after the merge
+        conn.execute(text(f"LOCK TABLE {Cart.__tablename__} IN SHARE ROW EXCLUSIVE MODE"))
+    merge_duplicate_cart_lines(conn)
+
+    if conn.dialect.name == "sqlite":
+        # SQLite can't add constraints to a table; a unique index serves ON CONFLICT the same way
+        conn.execute(text(f"CREATE UNIQUE INDEX {CART_UNIQUE} ON {Cart.__tablename__} (user_id, product_id)"))
+    else:
+        constraint = next(c for c in Cart.__table__.constraints if c.name == CART_UNIQUE)
+        conn.execute(AddConstraint(constraint))
+    return True
+
+
+def add_product_sku(conn):
+    """The products.sku column and its unique constraint, which bulk imports' ON CONFLICT (sku) needs"""
+    inspector = inspect(conn)
+    table = Product.__tablename__
+    applied = False
+    if "sku" not in {c["name"] for c in inspector.get_columns(table)}:
+        sku_type = Product.__table__.c.sku.type.compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN sku {sku_type}"))
+        applied = True
+
+    # Databases created by create_all before the constraint was named have it under another name
+    unique_columns = [c["column_names"] for c in inspector.get_unique_constraints(table)]
+    unique_columns += [i["column_names"] for i in inspector.get_indexes(table) if i["unique"]]
+    if ["sku"] in unique_columns:
+        return applied
+
+    if conn.dialect.name == "sqlite":
+        conn.execute(text(f"CREATE UNIQUE INDEX {PRODUCT_SKU_UNIQUE} ON {table} (sku)"))
+    else:
+        constraint = next(c for c in Product.__table__.constraints if c.name == PRODUCT_SKU_UNIQUE)
+        conn.execute(AddConstraint(constraint))
+    return True
+
+
+def create_missing_indexes(conn):
+    """
+    Every index the models declare, on tables created before the index was added.
+
+    The build blocks writes to its table until create-schema commits. For a large table, build
+    the index by hand first with CREATE INDEX CONCURRENTLY under the same name; it's skipped here.
+    """
+    inspector = inspect(conn)
+    tables = set(inspector.get_table_names())
+    created = False
+    for table in Base.metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        missing = [index for index in table.indexes if index.name not in existing]
+        for index in sorted(missing, key=lambda index: index.name):
+            # Honours ddl_if, so Postgres-only indexes are skipped elsewhere
+            index.create(conn)
+        if missing:
+            created |= {index["name"] for index in inspect(conn).get_indexes(table.name)} != existing
+    return created
+
+
+MIGRATIONS = [
+    add_cart_unique_constraint,
+    add_product_sku,
+    create_missing_indexes,
+]
+
+
+def migrate(conn):
+    """Apply the migrations the database is missing; returns the names of those applied"""
+    return [migration.__name__ for migration in MIGRATIONS if migration(conn)]
@@ -0,0 +1,13 @@
+import os
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def get_stripe():
+    """
+    The Stripe SDK, imported and configured on first use rather than at worker boot,
+    where importing it is one of the slowest steps
+    """
+    import stripe
+    stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
+    return stripe
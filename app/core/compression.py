@@ -0,0 +1,194 @@
+"""
+Response compression, negotiated per request from Accept-Encoding.
+
+CompressionMiddleware compresses JSON, NDJSON and text responses of at least
+COMPRESSION_MIN_SIZE bytes with brotli (when the brotli package is installed and the
+client accepts it) or gzip. Streamed responses, like order exports, are compressed chunk
+by chunk. Responses that already carry a Content-Encoding pass through untouched: the
+catalog cache stores a compressed copy of each hot response (see `compress` with
+cached=True) and sends that, so those bodies are compressed once instead of per request.
+
+A compressed body is a different representation, so its strong ETag is sent as a weak
+one (as nginx does); If-None-Match matching is weak and still finds it.
+"""
+import os
+import zlib
+from typing import Optional
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Smaller bodies gain less than the compression and the Content-Encoding header cost
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+# Per-request compression favours speed; cached bodies are compressed once, so they can afford a smaller result
+GZIP_LEVEL = 6
+CACHED_GZIP_LEVEL = 9
+BROTLI_QUALITY = 4
+CACHED_BROTLI_QUALITY = 9
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+# Preferred first, when the client accepts several equally
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """The best encoding from ENCODINGS the client accepts, or None to send the body as is"""
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip().lower()] = weight
+
+    best, best_weight = None, 0.0
+    for encoding in ENCODINGS:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def compress(body: bytes, encoding: str, cached: bool = False) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=CACHED_BROTLI_QUALITY if cached else BROTLI_QUALITY)
+    compressor = zlib.compressobj(CACHED_GZIP_LEVEL if cached else GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress(body) + compressor.flush()
+
+
+class StreamCompressor:
+    """Compresses a streamed body chunk by chunk, flushing each so clients see data as it's produced"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, chunk: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(chunk) + self._compressor.flush()
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def is_compressible(content_type: str) -> bool:
+    return content_type.startswith(COMPRESSIBLE_TYPES) and not content_type.startswith("text/event-stream")
+
+
+def weak_etag(etag: str) -> str:
+    return etag if etag.startswith("W/") else "W/" + etag
+
+
+def vary_on_encoding(vary: Optional[str] = None) -> str:
+    """A Vary header value that includes Accept-Encoding, so shared caches keep one copy per encoding"""
+    if not vary:
+        return "Accept-Encoding"
+    if "accept-encoding" in vary.lower():
+        return vary
+    return vary + ", Accept-Encoding"
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses per the request's Accept-Encoding"""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = None
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = negotiate(accept_encoding)
+
+        start = None
+        stream = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, stream, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in message["headers"]}
+                if "content-encoding" in headers or not is_compressible(headers.get("content-type", "")):
+                    passthrough = True
+                    await send(message)
+                    return
+                # Delay the start until the first body chunk says whether it's worth compressing
+                start = message
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if stream is not None:
+                chunk = stream.compress(body) if more_body else stream.compress(body) + stream.finish()
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+                return
+
+            compress_this = encoding is not None and (more_body or len(body) >= self.minimum_size)
+            headers = self.response_headers(start, encoding if compress_this else None)
+            if not compress_this:
+                passthrough = True
+                await send({**start, "headers": headers})
+                await send(message)
+                return
+
+            if more_body:
+                stream = StreamCompressor(encoding)
+                await send({**start, "headers": headers})
+                await send({"type": "http.response.body", "body": stream.compress(body), "more_body": True})
+                return
+
+            compressed = compress(body, encoding)
+            headers.append((b"content-length", str(len(compressed)).encode()))
+            await send({**start, "headers": headers})
+            await send({"type": "http.response.body", "body": compressed, "more_body": False})
+
+        await self.app(scope, receive, send_compressed)
+
+    @staticmethod
+    def response_headers(start: dict, encoding: Optional[str]) -> list:
+        """The start message's headers plus Vary, and the encoding headers when the body gets compressed"""
+        vary = None
+        headers = []
+        for name, value in start["headers"]:
+            key = name.lower()
+            if key == b"vary":
+                vary = value.decode("latin-1")
+            elif encoding and key == b"content-length":
+                continue
+            elif encoding and key == b"etag":
+                headers.append((name, weak_etag(value.decode("latin-1")).encode("latin-1")))
+            else:
+                headers.append((name, value))
+        headers.append((b"vary", vary_on_encoding(vary).encode("latin-1")))
+        if encoding:
+            headers.append((b"content-encoding", encoding.encode()))
+        return headers
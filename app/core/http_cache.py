@@ -0,0 +1,56 @@
+import os
+import hashlib
+from typing import Callable, Optional
+from fastapi import Request, Response
+from app.core.compression import negotiate, vary_on_encoding, weak_etag
+
+# Catalog data is the same for everyone, so browsers and the CDN may share it briefly
+CATALOG_CACHE_CONTROL = os.getenv("CATALOG_CACHE_CONTROL", "public, max-age=30, stale-while-revalidate=60")
+# Per-user data: only the user's own browser may keep it, and must revalidate before reuse
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(data) -> str:
+    """Strong ETag from serialized bytes, or from the repr of the rows a response is built from"""
+    if not isinstance(data, bytes):
+        data = repr(data).encode()
+    return '"' + hashlib.sha256(data).hexdigest()[:32] + '"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """True if the client's If-None-Match already names this ETag (weak comparison, per RFC 9110)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def conditional_response(
+    request: Request,
+    etag: str,
+    cache_control: str,
+    render: Callable[[], bytes],
+    headers: Optional[dict] = None,
+    compressed: Optional[Callable[[str], Optional[bytes]]] = None
+) -> Response:
+    """
+    Answer 304 Not Modified when the client already has `etag`, otherwise call `render` for
+    the JSON body. The body is only built when it is actually going to be sent.
+
+    `compressed` returns an already compressed body for an encoding (or None), for cached
+    responses that keep their compressed copies; the compression middleware leaves those alone.
+    """
+    headers = {**(headers or {}), "ETag": etag, "Cache-Control": cache_control}
+    body = None
+    if compressed is not None:
+        headers["Vary"] = vary_on_encoding()
+        encoding = negotiate(request.headers.get("accept-encoding"))
+        body = compressed(encoding) if encoding else None
+        if body is not None:
+            headers["ETag"] = weak_etag(etag)
+            headers["Content-Encoding"] = encoding
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body if body is not None else render(), media_type="application/json", headers=headers)
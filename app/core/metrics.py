@@ -0,0 +1,241 @@
+"""
+In-process metrics in the Prometheus text format, served by GET /metrics (behind METRICS_TOKEN).
+
+Each worker process keeps its own numbers; scrape every worker (or run one per container)
+to see them all. Recording a value is a dict lookup and a few additions under a lock, so
+the hot path pays next to nothing; formatting only happens when /metrics is scraped.
+"""
+import abc
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterable, Optional, Tuple
+from sqlalchemy import event
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; request and external call latencies
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Seconds; single SQL statements
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+# Statements per request
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+REGISTRY = []
+
+
+def escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(abc.ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    @abc.abstractmethod
+    def samples(self):
+        """Yield (name suffix, label text, value) for the exposition"""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{self.name}{suffix}{labels} {format_value(value)}" for suffix, labels, value in self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield "", format_labels(self.labelnames, labels), value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+
+class CallbackGauge(Metric):
+    """Gauge read at scrape time from `collect`, which returns (label values, value) pairs"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str], collect: Callable):
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+
+    def samples(self):
+        for labels, value in self.collect():
+            yield "", format_labels(self.labelnames, labels), value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        self._counts = {}  # labels -> per-bucket counts (not cumulative), last one is +Inf
+        self._sums = {}
+
+    def observe(self, value: float, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(labels)
+            if counts is None:
+                counts = self._counts[labels] = [0] * (len(self.buckets) + 1)
+                self._sums[labels] = 0.0
+            counts[index] += 1
+            self._sums[labels] += value
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def samples(self):
+        with self._lock:
+            series = [(labels, list(counts), self._sums[labels]) for labels, counts in self._counts.items()]
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield "_bucket", format_labels(self.labelnames, labels, f'le="{format_value(bound)}"'), cumulative
+            yield "_sum", format_labels(self.labelnames, labels), total
+            yield "_count", format_labels(self.labelnames, labels), cumulative
+
+
+def render() -> bytes:
+    return ("\n".join(metric.render() for metric in REGISTRY) + "\n").encode()
+
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time to handle a request, by route template", ("method", "route", "status")
+)
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being handled")
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "Time to run one SQL statement, by statement kind", ("operation",),
+    buckets=QUERY_BUCKETS
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request", "SQL statements run while handling a request", ("route",), buckets=COUNT_BUCKETS
+)
+DB_SECONDS_PER_REQUEST = Histogram(
+    "db_query_seconds_per_request", "Time spent in SQL statements while handling a request", ("route",)
+)
+TOKEN_VERIFY_SECONDS = Histogram(
+    "token_verify_duration_seconds", "Time to verify a Firebase ID token that missed the token cache", ("result",),
+    buckets=QUERY_BUCKETS
+)
+STRIPE_REQUEST_SECONDS = Histogram(
+    "stripe_request_duration_seconds", "Time spent in Stripe API calls", ("operation",)
+)
+
+
+class RequestStats:
+    __slots__ = ("queries", "query_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+
+
+# Stats of the request the current task is handling, None outside requests (e.g. webhook workers)
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_start = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_metrics_start", None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    DB_QUERY_SECONDS.observe(elapsed, statement.lstrip().split(None, 1)[0].upper())
+    stats = current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.query_seconds += elapsed
+
+
+def instrument_engine(engine):
+    """Time every statement run through `engine` (sync or async)"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    event.listen(sync_engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", after_cursor_execute)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, in-flight requests and SQL usage per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        stats = RequestStats()
+        token = current_request.set(stats)
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_IN_FLIGHT.dec()
+            current_request.reset(token)
+            # The template (/api/v1/products/{product_id}), not the raw path, keeps the series count bounded
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.observe(elapsed, scope["method"], template, status)
+            DB_QUERIES_PER_REQUEST.observe(stats.queries, template)
+            DB_SECONDS_PER_REQUEST.observe(stats.query_seconds, template)
@@ -0,0 +1,156 @@
+"""
+Per-request SQL statement budgets and N+1 detection.
+
+Every route declares how many statements it may run with @query_budget. The middleware
+counts the statements each request runs, keyed by their compiled SQL (bind parameters
+excluded, so the same query for different ids is one fingerprint), and reports requests
+that go over budget or run one statement more than `max_repeats` times - the usual shape
+of an N+1 query. QUERY_BUDGET_MODE=log (default) logs them; =off skips counting; =raise,
+which tests and the benchmark suite run with, fails the request: the response is held back
+until the handler finishes and replaced by a 500. Streamed responses have sent their status
+before the last statement runs, so raise mode can only end those with a server error.
+"""
+import os
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "log")
+# Budget of routes that don't declare one
+DEFAULT_QUERY_BUDGET = int(os.getenv("DEFAULT_QUERY_BUDGET", "10"))
+# Runs of one identical statement allowed per request before it counts as N+1
+DEFAULT_MAX_REPEATS = int(os.getenv("QUERY_MAX_REPEATS", "2"))
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(max_queries: Optional[int], max_repeats: int = DEFAULT_MAX_REPEATS):
+    """
+    Declare the most statements a route may run per request; put it below the @router decorator.
+    None exempts routes whose statement count grows with their input, like bulk imports.
+    """
+    def decorate(endpoint):
+        endpoint.query_budget = (max_queries, max_repeats)
+        return endpoint
+    return decorate
+
+
+def fingerprint(statement: str) -> str:
+    return " ".join(statement.split())[:200]
+
+
+class QueryLog:
+    """Statements run within one request (or one track_queries block), counted per compiled SQL"""
+
+    __slots__ = ("total", "statements")
+
+    def __init__(self):
+        self.total = 0
+        self.statements = {}
+
+    def record(self, statement: str):
+        self.total += 1
+        # SQLAlchemy caches compiled SQL, so equal statements are usually the same string object
+        self.statements[statement] = self.statements.get(statement, 0) + 1
+
+    def repeated(self, max_repeats: int):
+        return [(fingerprint(sql), count) for sql, count in self.statements.items() if count > max_repeats]
+
+    def violations(self, max_queries: Optional[int], max_repeats: int):
+        if max_queries is None:
+            return []
+        problems = []
+        if self.total > max_queries:
+            problems.append(f"{self.total} statements, budget is {max_queries}")
+        for sql, count in self.repeated(max_repeats):
+            problems.append(f"possible N+1, ran {count} times: {sql}")
+        return problems
+
+
+current_log: ContextVar[Optional[QueryLog]] = ContextVar("current_query_log", default=None)
+
+
+def count_statement(conn, cursor, statement, parameters, context, executemany):
+    log = current_log.get()
+    if log is not None:
+        log.record(statement)
+
+
+def instrument_engine(engine):
+    """Count every statement run through `engine` (sync or async) against the current request"""
+    event.listen(getattr(engine, "sync_engine", engine), "before_cursor_execute", count_statement)
+
+
+@contextmanager
+def track_queries():
+    """
+    Count the statements run inside the block, e.g. in a test:
+
+        with track_queries() as log:
+            await CartService.get_cart(db, uid)
+        assert log.total == 1
+    """
+    log = QueryLog()
+    token = current_log.set(log)
+    try:
+        yield log
+    finally:
+        current_log.reset(token)
+
+
+class QueryBudgetMiddleware:
+    """ASGI middleware checking each request's statements against its route's @query_budget"""
+
+    def __init__(self, app, mode: str = QUERY_BUDGET_MODE):
+        self.app = app
+        self.mode = mode
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.mode == "off":
+            await self.app(scope, receive, send)
+            return
+
+        if self.mode != "raise":
+            with track_queries() as log:
+                await self.app(scope, receive, send)
+            self.check(scope, log)
+            return
+
+        # Hold the response start until the body is complete, so a violation can still become a 500
+        start = None
+
+        async def send_checked(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if start is not None:
+                if message["type"] == "http.response.body" and not message.get("more_body", False):
+                    self.check(scope, log)
+                await send(start)
+                start = None
+            await send(message)
+
+        with track_queries() as log:
+            await self.app(scope, receive, send_checked)
+        self.check(scope, log)
+
+    def check(self, scope, log: QueryLog):
+        route = scope.get("route")
+        if route is None:
+            return
+        budget = getattr(route.endpoint, "query_budget", None) or (DEFAULT_QUERY_BUDGET, DEFAULT_MAX_REPEATS)
+        problems = log.violations(*budget)
+        if not problems:
+            return
+
+        message = f"{scope['method']} {route.path}: " + "; ".join(problems)
+        if self.mode == "raise":
+            raise QueryBudgetExceeded(message)
+        logger.warning("Query budget exceeded by %s", message)
@@ -0,0 +1,71 @@
+"""
+Read-your-writes across worker processes and instances.
+
+A user's reads of their own data (cart, orders) go to the read replica unless they wrote
+recently. The worker that made a write remembers it (RecentWrites in app.config.database),
+but the user's next request may be served by any other worker. So the response to a request
+that wrote also sets a short-lived cookie holding the time until which that browser's reads
+must go to the primary, and every worker honours it (`reads_primary`).
+
+The cookie is only a routing hint: a client that forges it just reads its own data from the
+primary, for at most MAX_READ_PRIMARY_SECONDS.
+"""
+import math
+import time
+from contextvars import ContextVar
+from typing import Mapping
+
+READ_PRIMARY_COOKIE = "read_primary_until"
+MAX_READ_PRIMARY_SECONDS = 3600
+
+# Per request: a one-item list holding the latest "read the primary until" time of its writes
+_written_until = ContextVar("written_until", default=None)
+
+
+def note_write(until: float):
+    """Record that the current request wrote, so its response pins the user's reads to the primary until `until`"""
+    holder = _written_until.get()
+    if holder is not None:
+        holder[0] = max(holder[0], until)
+
+
+def reads_primary(cookies: Mapping[str, str]) -> bool:
+    """Whether the request's cookie says the user wrote too recently for the replica to have caught up"""
+    try:
+        until = float(cookies.get(READ_PRIMARY_COOKIE, 0))
+    except ValueError:
+        return False
+    now = time.time()
+    return now < until <= now + MAX_READ_PRIMARY_SECONDS
+
+
+class ReadYourWritesMiddleware:
+    """ASGI middleware adding the read-the-primary cookie to responses of requests that wrote"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        holder = [0.0]
+        token = _written_until.set(holder)
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start":
+                max_age = math.ceil(holder[0] - time.time())
+                if max_age > 0:
+                    # SameSite=None: the frontend calls the API cross-origin, with credentials
+                    cookie = (
+                        f"{READ_PRIMARY_COOKIE}={holder[0]:.3f}; Max-Age={max_age}; Path=/api; "
+                        "HttpOnly; Secure; SameSite=None"
+                    )
+                    message = {**message, "headers": [*message["headers"], (b"set-cookie", cookie.encode("latin-1"))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_cookie)
+        finally:
+            _written_until.reset(token)
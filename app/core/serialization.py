@@ -0,0 +1,72 @@
+"""
+Fast JSON for large responses, written with orjson.
+
+Routes returning ORM objects under a response_model have FastAPI validate every object
+against the schema (from_attributes) before encoding it, which for a page of a thousand
+products costs more than the query. That data was just read from our own database with
+the schema's column types, so list endpoints can opt out: a RowSerializer writes rows or
+objects straight to the same JSON, in the schema's field order, without validating them.
+Only use it where every value already has the schema's type; anything that needs pydantic
+to coerce, default or hide a field should keep going through the response_model.
+"""
+from operator import attrgetter
+from typing import Dict, Iterable, Optional, Type
+import orjson
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+# Aware UTC datetimes as "...Z", like pydantic; naive ones (SQLite) are written as stored
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSONResponse encoded with orjson, for routes that return plain dicts and lists without a
+    response_model. Routes with a response_model should keep the default response class:
+    FastAPI only dumps those through pydantic's own encoder when no response_class is set.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+class RowSerializer:
+    """
+    Writes rows for `schema` to JSON bytes without validating them.
+
+    dump_rows takes tuples whose values are in the schema's field order, like a select() of
+    the matching columns; dump_objects reads the fields as attributes of ORM objects. List
+    fields holding nested schemas, such as an order's items, get their own serializer in `nested`.
+    """
+
+    def __init__(self, schema: Type[BaseModel], nested: Optional[Dict[str, "RowSerializer"]] = None):
+        self.schema = schema
+        self.fields = tuple(schema.model_fields)
+        self.nested = nested or {}
+        self._get = attrgetter(*self.fields)
+        if len(self.fields) == 1:
+            get_one = self._get
+            self._get = lambda obj: (get_one(obj),)
+
+    def from_row(self, row) -> dict:
+        return dict(zip(self.fields, row))
+
+    def from_object(self, obj) -> dict:
+        data = dict(zip(self.fields, self._get(obj)))
+        for name, serializer in self.nested.items():
+            data[name] = [serializer.from_object(item) for item in data[name]]
+        return data
+
+    def dump_rows(self, rows: Iterable) -> bytes:
+        fields = self.fields
+        return dumps([dict(zip(fields, row)) for row in rows])
+
+    def dump_objects(self, objects: Iterable) -> bytes:
+        return dumps([self.from_object(obj) for obj in objects])
+
+    def dump_object(self, obj) -> bytes:
+        return dumps(self.from_object(obj))
@@ -1,6 +1,10 @@
 from app.models.user import User
+from app.models.inventory import StockShard
 from app.models.product import Product
 from app.models.cart import Cart
 from app.models.order import Order
 from app.models.order_item import OrderItem
 from app.models.payment import Payment
+from app.models.webhook_event import WebhookEvent
+from app.models.sales_rollup import ProductSalesDaily, CategorySalesDaily
+from app.models.catalog_state import CatalogState
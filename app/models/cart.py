@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.config.database import Base
 
@@ -13,3 +13,8 @@ class Cart(Base):
 
     user = relationship("User", back_populates="cart_items")
     product = relationship("Product", back_populates="cart_items")
+
+    # One row per product per user; lets cart writes upsert with ON CONFLICT (user_id, product_id)
+    __table_args__ = (
+        UniqueConstraint("user_id", "product_id", name="uq_cart_user_id_product_id"),
+    )
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, BigInteger
+from app.config.database import Base
+
+
+class CatalogState(Base):
+    __tablename__ = "catalog_state"
+
+    # A single row (id 1) that every worker process shares. Catalog writes bump it once they
+    # commit; each worker's catalog cache compares it with the version it last saw
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)  # Bumped by every catalog write
+    text_version = Column(BigInteger, nullable=False, default=0)  # Not bumped by stock-only writes (checkouts)
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, ForeignKey
+from app.config.database import Base
+
+
+class StockShard(Base):
+    __tablename__ = "product_stock_shards"
+
+    # A product's stock is split across several rows so concurrent purchases of the
+    # same product update different rows instead of all queueing on one row lock
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    shard = Column(Integer, primary_key=True)  # 0 .. INVENTORY_SHARDS - 1
+    stock = Column(Integer, nullable=False, default=0)  # This shard's share of the available quantity
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.sql import func
 from app.config.database import Base
 
@@ -11,10 +12,20 @@ class Order(Base):
     user_id = Column(String, ForeignKey("users.id"), nullable=False)  # Firebase UID
     total_amount = Column(Float, nullable=False)  # Sum of all order items
     status = Column(String, default="pending")  # pending, paid, delivered
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # SQLite's CURRENT_TIMESTAMP has no fractional part; bind cursor values the same way so they compare equal
+    created_at = Column(
+        DateTime(timezone=True).with_variant(sqlite.DATETIME(truncate_microseconds=True), "sqlite"),
+        server_default=func.now()
+    )
 
     user = relationship("User", back_populates="orders")
     # One order contains many order items
     order_items = relationship("OrderItem", back_populates="order")
     # One order has exactly one payment (uselist=False enforces one-to-one)
     payment = relationship("Payment", back_populates="order", uselist=False)
+
+    # Order history is keyset-paginated per user, newest first; exports scan a date range in order
+    __table_args__ = (
+        Index("ix_orders_user_id_created_at_id", "user_id", created_at.desc(), id.desc()),
+        Index("ix_orders_created_at_id", "created_at", "id"),
+    )
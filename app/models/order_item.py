@@ -7,7 +7,7 @@ class OrderItem(Base):
     __tablename__ = "order_items"
 
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)  # Which order this item belongs to
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)  # Which order this item belongs to
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)  # Which product was ordered
     quantity = Column(Integer, nullable=False)  # How many of this product
     price = Column(Float, nullable=False)  # Price at time of purchase (snapshot)
@@ -1,7 +1,25 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float, DateTime, Index, UniqueConstraint, literal_column, select
+from sqlalchemy.orm import relationship, column_property
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.sql import func
 from app.config.database import Base
+from app.models.inventory import StockShard
+
+
+def search_vector(name, description, category):
+    """
+    Weighted Postgres tsvector over a product's text (name > category > description).
+
+    Constants are rendered inline rather than bound, so the expression the search query
+    uses is textually identical to the GIN index expression and the planner can match them.
+    """
+    def weighted(column, weight):
+        return func.setweight(
+            func.to_tsvector(literal_column("'english'::regconfig"), func.coalesce(column, literal_column("''"))),
+            literal_column(f"'{weight}'")
+        )
+
+    return weighted(name, "A").op("||")(weighted(category, "B")).op("||")(weighted(description, "C"))
 
 
 class Product(Base):
@@ -9,14 +27,41 @@ class Product(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
+    sku = Column(String, nullable=True)  # Bulk imports upsert on this (uq_products_sku)
     description = Column(String, nullable=True)
     price = Column(Float, nullable=False)
-    stock = Column(Integer, default=0)  # Available quantity in inventory
     image_url = Column(String, nullable=True)  # URL to product image
     category = Column(String, nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # SQLite's CURRENT_TIMESTAMP has no fractional part; bind cursor values the same way so they compare equal
+    created_at = Column(
+        DateTime(timezone=True).with_variant(sqlite.DATETIME(truncate_microseconds=True), "sqlite"),
+        server_default=func.now()
+    )
+
+    # Available quantity in inventory: the sum of the product's stock shards (see InventoryService)
+    stock = column_property(
+        select(func.coalesce(func.sum(StockShard.stock), 0))
+        .where(StockShard.product_id == id)
+        .correlate_except(StockShard)
+        .scalar_subquery()
+    )
 
     # One product can appear in many carts
     cart_items = relationship("Cart", back_populates="product")
     # One product can appear in many order items
     order_items = relationship("OrderItem", back_populates="product")
+
+    __table_args__ = (
+        # Lets bulk imports upsert with ON CONFLICT (sku); products without a SKU don't conflict
+        UniqueConstraint("sku", name="uq_products_sku"),
+        # Listing is keyset-paginated newest first on (created_at, id), optionally filtered
+        Index("ix_products_created_at_id", "created_at", "id"),
+        Index("ix_products_category_created_at_id", "category", "created_at", "id"),
+        Index("ix_products_price", "price"),
+        # Full-text search; other databases use the in-memory index in search_service instead
+        Index(
+            "ix_products_search",
+            search_vector(name, description, category),
+            postgresql_using="gin"
+        ).ddl_if(dialect="postgresql"),
+    )
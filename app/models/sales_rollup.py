@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, String, Float, Date
+from app.config.database import Base
+
+
+# Daily sales totals kept up to date by checkout fulfilment, so reports never scan orders.
+# Days are UTC. A day's totals are spread over shard rows (summed when read) for the same
+# reason stock is: concurrent checkouts of a best seller would otherwise queue on one row.
+# No foreign key to products: sales history outlives deleted products.
+class ProductSalesDaily(Base):
+    __tablename__ = "product_sales_daily"
+
+    day = Column(Date, primary_key=True)
+    product_id = Column(Integer, primary_key=True)
+    shard = Column(Integer, primary_key=True)  # 0 .. SALES_ROLLUP_SHARDS - 1
+    units = Column(Integer, nullable=False, default=0)  # Quantity sold
+    revenue = Column(Float, nullable=False, default=0)  # Sum of quantity * price at time of purchase
+    orders = Column(Integer, nullable=False, default=0)  # Orders containing the product
+
+
+class CategorySalesDaily(Base):
+    __tablename__ = "category_sales_daily"
+
+    day = Column(Date, primary_key=True)
+    category = Column(String, primary_key=True)  # "" for products without a category
+    shard = Column(Integer, primary_key=True)
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+    orders = Column(Integer, nullable=False, default=0)  # Orders containing products of the category
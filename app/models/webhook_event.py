@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from sqlalchemy.sql import func
+from app.config.database import Base
+
+
+class WebhookEvent(Base):
+    __tablename__ = "webhook_events"
+
+    id = Column(String, primary_key=True)  # Stripe event id (evt_...), so redelivered events are stored once
+    type = Column(String, nullable=False)  # e.g. checkout.session.completed
+    payload = Column(Text, nullable=False)  # Raw event body exactly as Stripe sent it
+    status = Column(String, default="pending")  # pending, done, failed
+    attempts = Column(Integer, default=0)  # Processing attempts so far
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now())  # Not claimed before this time
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Workers poll for due pending events
+    __table_args__ = (
+        Index("ix_webhook_events_status_next_attempt_at", "status", "next_attempt_at"),
+    )
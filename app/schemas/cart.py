@@ -1,11 +1,11 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Literal, Optional
 
 
 # Schema for adding a product to cart
 class CartAdd(BaseModel):
     product_id: int
-    quantity: int = 1
+    quantity: int = Field(1, ge=1)
 
 
 # Schema for updating cart item quantity
@@ -13,6 +13,26 @@ class CartUpdate(BaseModel):
     quantity: int
 
 
+# A single change within a batch cart update
+class CartOperation(BaseModel):
+    op: Literal["add", "set", "remove"]  # add increases quantity, set replaces it (0 removes), remove deletes the line
+    product_id: int
+    quantity: int = 1
+
+    @model_validator(mode="after")
+    def check_quantity(self):
+        if self.op == "add" and self.quantity < 1:
+            raise ValueError("add needs a quantity of at least 1")
+        if self.op == "set" and self.quantity < 0:
+            raise ValueError("set needs a quantity of 0 or more")
+        return self
+
+
+# Schema for applying several cart changes at once, in order
+class CartBatch(BaseModel):
+    operations: List[CartOperation] = Field(..., min_length=1, max_length=200)
+
+
 # Schema for returning cart item data (includes product details for display)
 class CartItemOut(BaseModel):
     id: int
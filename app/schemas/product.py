@@ -6,6 +6,7 @@ from typing import Optional
 # Schema for creating a new product (what the API accepts)
 class ProductCreate(BaseModel):
     name: str
+    sku: Optional[str] = None  # Stock keeping unit; bulk imports update the product with the same SKU
     description: Optional[str] = None
     price: float
     stock: int = 0
@@ -16,6 +17,7 @@ class ProductCreate(BaseModel):
 # Schema for updating a product (all fields optional)
 class ProductUpdate(BaseModel):
     name: Optional[str] = None
+    sku: Optional[str] = None
     description: Optional[str] = None
     price: Optional[float] = None
     stock: Optional[int] = None
@@ -27,6 +29,7 @@ class ProductUpdate(BaseModel):
 class ProductOut(BaseModel):
     id: int
     name: str
+    sku: Optional[str] = None
     description: Optional[str]
     price: float
     stock: int
@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+from datetime import date
+from typing import Optional
+
+
+# Sales totals of one product over a date range
+class ProductSalesOut(BaseModel):
+    product_id: int
+    units: int
+    revenue: float
+    orders: int  # Orders containing the product
+
+
+# Sales totals of one category on one day
+class CategorySalesOut(BaseModel):
+    day: date
+    category: Optional[str]  # None for products without a category
+    units: int
+    revenue: float
+    orders: int  # Orders containing products of the category
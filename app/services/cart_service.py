@@ -1,62 +1,139 @@
-from sqlalchemy.orm import Session
+from fastapi import HTTPException
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config.database import dialect_insert, recent_writes
 from app.models.cart import Cart
 from app.models.product import Product
 
+# Everything CartItemOut needs, in its field order: id, product_id, quantity, product name/price/image
+CART_ITEM_COLUMNS = (
+    Cart.id,
+    Cart.product_id,
+    Cart.quantity,
+    Product.name,
+    Product.price,
+    Product.image_url,
+)
+
 
 class CartService:
 
-    # Get all cart items for a user
-    def get_cart(db: Session, user_id: str):
-        return db.query(Cart).filter(Cart.user_id == user_id).all()
+    # Get all cart items for a user as (id, product_id, quantity, name, price, image_url) rows, in one joined query
+    async def get_cart(db: AsyncSession, user_id: str):
+        result = await db.execute(
+            select(*CART_ITEM_COLUMNS)
+            .join(Product, Cart.product_id == Product.id)
+            .filter(Cart.user_id == user_id)
+            .order_by(Cart.id)
+        )
+        return result.all()
 
-    # Add a product to cart (if already in cart, increase quantity)
-    def add_to_cart(db: Session, user_id: str, product_id: int, quantity: int):
-        product = db.query(Product).filter(Product.id == product_id).first()
+    # Add a product to cart (if already in cart, increase quantity).
+    # One upsert, so concurrent adds of the same product both land instead of racing to insert the line.
+    async def add_to_cart(db: AsyncSession, user_id: str, product_id: int, quantity: int):
+        result = await db.execute(
+            select(Product.name, Product.price, Product.image_url).filter(Product.id == product_id)
+        )
+        product = result.first()
         if not product:
             return None
 
-        existing = db.query(Cart).filter(
-            Cart.user_id == user_id,
-            Cart.product_id == product_id
-        ).first()
-
-        if existing:
-            existing.quantity += quantity
-            db.commit()
-            db.refresh(existing)
-            return existing
+        upsert = dialect_insert(db, Cart).values(user_id=user_id, product_id=product_id, quantity=quantity)
+        result = await db.execute(
+            upsert.on_conflict_do_update(
+                index_elements=[Cart.user_id, Cart.product_id],
+                set_={"quantity": Cart.quantity + upsert.excluded.quantity}
+            ).returning(Cart.id, Cart.quantity)
+        )
+        item = result.one()
 
-        new_item = Cart(user_id=user_id, product_id=product_id, quantity=quantity)
-        db.add(new_item)
-        db.commit()
-        db.refresh(new_item)
-        return new_item
+        await db.commit()
+        recent_writes.mark(user_id)
+        return (item.id, product_id, item.quantity, product.name, product.price, product.image_url)
 
     # Update quantity of a cart item
-    def update_cart_item(db: Session, user_id: str, product_id: int, quantity: int):
-        item = db.query(Cart).filter(
-            Cart.user_id == user_id,
-            Cart.product_id == product_id
-        ).first()
+    async def update_cart_item(db: AsyncSession, user_id: str, product_id: int, quantity: int):
+        result = await db.execute(
+            select(Cart, Product.name, Product.price, Product.image_url)
+            .join(Product, Cart.product_id == Product.id)
+            .filter(
+                Cart.user_id == user_id,
+                Cart.product_id == product_id
+            )
+        )
+        row = result.first()
 
-        if not item:
+        if not row:
             return None
 
+        item, name, price, image_url = row
         item.quantity = quantity
-        db.commit()
-        db.refresh(item)
-        return item
+        await db.commit()
+        recent_writes.mark(user_id)
+        return (item.id, item.product_id, item.quantity, name, price, image_url)
 
     # Remove a product from cart
-    def remove_from_cart(db: Session, user_id: str, product_id: int):
-        item = db.query(Cart).filter(
-            Cart.user_id == user_id,
-            Cart.product_id == product_id
-        ).first()
-
-        if not item:
-            return False
-
-        db.delete(item)
-        db.commit()
-        return True
+    async def remove_from_cart(db: AsyncSession, user_id: str, product_id: int):
+        result = await db.execute(
+            delete(Cart).filter(
+                Cart.user_id == user_id,
+                Cart.product_id == product_id
+            )
+        )
+        await db.commit()
+        recent_writes.mark(user_id)
+        return result.rowcount > 0
+
+    # Apply a list of add/set/remove operations in one transaction and return the resulting cart.
+    # Operations are folded per product first, so the whole batch costs one statement per kind.
+    async def apply_batch(db: AsyncSession, user_id: str, operations: list):
+        final = {}  # product_id -> ("add", n) | ("set", n) | ("remove", 0)
+        for operation in operations:
+            current = final.get(operation.product_id)
+            if operation.op == "remove" or (operation.op == "set" and operation.quantity <= 0):
+                final[operation.product_id] = ("remove", 0)
+            elif operation.op == "set":
+                final[operation.product_id] = ("set", operation.quantity)
+            elif current is None:
+                final[operation.product_id] = ("add", operation.quantity)
+            elif current[0] == "remove":
+                final[operation.product_id] = ("set", operation.quantity)
+            else:
+                final[operation.product_id] = (current[0], current[1] + operation.quantity)
+
+        adds = {product_id: quantity for product_id, (kind, quantity) in final.items() if kind == "add"}
+        sets = {product_id: quantity for product_id, (kind, quantity) in final.items() if kind == "set"}
+        removes = [product_id for product_id, (kind, _) in final.items() if kind == "remove"]
+
+        # Check every product being added exists, in one query
+        wanted = set(adds) | set(sets)
+        if wanted:
+            result = await db.execute(select(Product.id).filter(Product.id.in_(wanted)))
+            missing = sorted(wanted - set(result.scalars().all()))
+            if missing:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"Products with ids {', '.join(map(str, missing))} not found"
+                )
+
+        if removes:
+            await db.execute(delete(Cart).filter(Cart.user_id == user_id, Cart.product_id.in_(removes)))
+
+        for quantities, increment in ((adds, True), (sets, False)):
+            if not quantities:
+                continue
+            upsert = dialect_insert(db, Cart).values([
+                {"user_id": user_id, "product_id": product_id, "quantity": quantity}
+                for product_id, quantity in quantities.items()
+            ])
+            new_quantity = Cart.quantity + upsert.excluded.quantity if increment else upsert.excluded.quantity
+            await db.execute(
+                upsert.on_conflict_do_update(
+                    index_elements=[Cart.user_id, Cart.product_id],
+                    set_={"quantity": new_quantity}
+                )
+            )
+
+        await db.commit()
+        recent_writes.mark(user_id)
+        return await CartService.get_cart(db, user_id)
@@ -0,0 +1,194 @@
+import os
+import time
+import logging
+from collections import OrderedDict
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.catalog_state import CatalogState
+from app.schemas.product import ProductOut
+from app.services.product_service import ProductService, PRODUCT_OUT_COLUMNS
+from app.config.database import recent_writes, CATALOG_WRITES, dialect_insert
+from app.core.http_cache import make_etag
+from app.core.serialization import RowSerializer
+from app.core.compression import compress, COMPRESSION_MIN_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Product rows are written as read, without re-validating them against ProductOut
+product_serializer = RowSerializer(ProductOut)
+
+
+class CatalogEntry:
+    """A cached catalog response: the serialized ProductOut JSON, its ETag, paging info and compressed copies"""
+
+    __slots__ = ("body", "etag", "next_cursor", "version", "expires_at", "encoded")
+
+    def __init__(self, body: bytes, next_cursor: Optional[str], version: int, expires_at: float):
+        self.body = body
+        self.etag = make_etag(body)
+        self.next_cursor = next_cursor
+        self.version = version
+        self.expires_at = expires_at
+        self.encoded = {}
+
+    def compressed(self, encoding: str) -> Optional[bytes]:
+        """The body compressed with `encoding`, compressed on first use and kept with the entry; None if too small"""
+        if len(self.body) < COMPRESSION_MIN_SIZE:
+            return None
+        body = self.encoded.get(encoding)
+        if body is None:
+            body = self.encoded[encoding] = compress(self.body, encoding, cached=True)
+        return body
+
+
+class CatalogCache:
+    """
+    In-process cache of serialized product reads sitting in front of ProductService.
+
+    Every catalog write bumps `version`, which drops all entries at once. A read only stores
+    its result if no write happened while it was querying, so a response built from pre-write
+    rows can never be cached after the write.
+
+    Each worker process keeps its own cache, so writes are also published through the shared
+    catalog_state row: `publish` bumps it, and reads compare it with the version last seen at
+    most every `check_interval` seconds, dropping all entries when another worker wrote. A
+    worker therefore serves another worker's write at most `check_interval` seconds late (plus
+    the read that was in flight). The TTL still bounds staleness if a bump fails.
+
+    `text_version` only moves on writes that may change product text, not on stock-only writes
+    like checkouts, for caches of text alone (the in-memory search index).
+    """
+
+    def __init__(self, ttl: float = 60, max_entries: int = 1024, check_interval: float = 1):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.check_interval = check_interval
+        self.version = 0
+        self.text_version = 0
+        self.shared = None  # (version, text_version) of the catalog_state row when last checked
+        self.checked_at = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def _drop(self, stock_only: bool):
+        self.version += 1
+        if not stock_only:
+            self.text_version += 1
+        self._entries.clear()
+
+    def invalidate(self, stock_only: bool = False):
+        """Drop this worker's entries after a catalog write it committed"""
+        self._drop(stock_only)
+        # Refills must not come from a replica that hasn't seen the write yet
+        recent_writes.mark(CATALOG_WRITES)
+
+    async def publish(self, db: AsyncSession, stock_only: bool = False):
+        """
+        Invalidate after a committed catalog write, then bump the shared catalog_state row in a
+        transaction of its own, so the other workers drop their entries on their next check.
+        """
+        self.invalidate(stock_only)
+
+        state = CatalogState.__table__
+        bump = {"version": state.c.version + 1}
+        if not stock_only:
+            bump["text_version"] = state.c.text_version + 1
+        upsert = (
+            dialect_insert(db, state)
+            .values(id=1, version=1, text_version=0 if stock_only else 1)
+            .on_conflict_do_update(index_elements=[state.c.id], set_=bump)
+            .returning(state.c.version, state.c.text_version)
+        )
+        try:
+            shared = tuple((await db.execute(upsert)).one())
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            logger.exception("Couldn't bump the shared catalog version; other workers may serve stale entries until their TTL")
+            return
+
+        # This worker already dropped its entries for its own bump; a gap means other writes came in between
+        if self.shared is not None and shared == (self.shared[0] + 1, self.shared[1] + (0 if stock_only else 1)):
+            self.shared = shared
+
+    async def sync(self, db: AsyncSession):
+        """Drop all entries if another worker published a write since the last check, at most once per check_interval"""
+        now = time.monotonic()
+        if self.checked_at is not None and now - self.checked_at < self.check_interval:
+            return
+        self.checked_at = now
+
+        row = (await db.execute(
+            select(CatalogState.version, CatalogState.text_version).filter(CatalogState.id == 1)
+        )).first()
+        shared = tuple(row) if row else (0, 0)
+        if self.shared is not None and shared != self.shared:
+            self._drop(stock_only=shared[1] == self.shared[1])
+        self.shared = shared
+
+    def _get(self, key) -> Optional[CatalogEntry]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.version == self.version and entry.expires_at > time.monotonic():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def _put(self, key, entry: CatalogEntry):
+        if entry.version != self.version:
+            return
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _entry(self, body: bytes, next_cursor: Optional[str], version: int) -> CatalogEntry:
+        return CatalogEntry(body, next_cursor, version, time.monotonic() + self.ttl)
+
+    async def get_products(
+        self,
+        db: AsyncSession,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        category: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        in_stock: bool = False
+    ) -> CatalogEntry:
+        await self.sync(db)
+        key = ("list", limit, cursor, category, min_price, max_price, in_stock)
+        entry = self._get(key)
+        if entry is None:
+            version = self.version
+            products, next_cursor = await ProductService.get_all_products(
+                db, limit, cursor, category, min_price, max_price, in_stock, columns=PRODUCT_OUT_COLUMNS
+            )
+            entry = self._entry(product_serializer.dump_rows(products), next_cursor, version)
+            self._put(key, entry)
+        return entry
+
+    async def get_product(self, db: AsyncSession, product_id: int) -> Optional[CatalogEntry]:
+        await self.sync(db)
+        key = ("product", product_id)
+        entry = self._get(key)
+        if entry is None:
+            version = self.version
+            product = await ProductService.get_product_by_id(db, product_id)
+            if not product:
+                return None
+            entry = self._entry(product_serializer.dump_object(product), None, version)
+            self._put(key, entry)
+        return entry
+
+    def stats(self) -> dict:
+        return {"version": self.version, "size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+catalog_cache = CatalogCache(
+    ttl=float(os.getenv("CATALOG_CACHE_TTL", "60")),
+    max_entries=int(os.getenv("CATALOG_CACHE_SIZE", "1024")),
+    check_interval=float(os.getenv("CATALOG_VERSION_CHECK_SECONDS", "1")),
+)
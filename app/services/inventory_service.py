@@ -0,0 +1,212 @@
+import os
+import random
+from typing import Optional
+from sqlalchemy import (
+    select, update, delete, insert, func, text, inspect, literal, column, case, true, bindparam, tuple_, Integer
+)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.inventory import StockShard
+
+# Stock rows per product. More shards let more concurrent checkouts of one product proceed in parallel.
+INVENTORY_SHARDS = int(os.getenv("INVENTORY_SHARDS", "8"))
+
+
+def split_stock(total: int, shards: int):
+    """Spread `total` as evenly as possible over `shards` counters"""
+    base, remainder = divmod(max(total, 0), shards)
+    return [base + (1 if shard < remainder else 0) for shard in range(shards)]
+
+
+def take_from_free_shards(db: AsyncSession, quantities: dict):
+    """
+    UPDATE taking each product's quantity from one random shard that has enough and isn't locked,
+    returning the ids of the products it took from
+    """
+    shards = StockShard.__table__
+    if len(quantities) == 1:
+        # A single product, the usual order for a hot item: a one-row UPDATE, which plans and runs cheaper than the join
+        [(product_id, quantity)] = quantities.items()
+        free_shard = (
+            select(shards.c.shard)
+            .filter(shards.c.product_id == product_id, shards.c.stock >= quantity)
+            .order_by(func.random())
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        return (
+            update(shards)
+            .filter(shards.c.product_id == product_id, shards.c.shard == free_shard)
+            .values(stock=shards.c.stock - quantity)
+            .returning(shards.c.product_id)
+        )
+
+    if db.bind.dialect.name == "postgresql":
+        # Arrays rather than VALUES rows, so the statement is the same for every order and stays cached
+        product_ids, counts = zip(*sorted(quantities.items()))
+        wanted = (
+            func.unnest(literal(list(product_ids), ARRAY(Integer)), literal(list(counts), ARRAY(Integer)))
+            .table_valued(column("product_id", Integer), column("quantity", Integer))
+            .render_derived(name="wanted")
+        )
+        free_shard = (
+            select(shards.c.shard)
+            .filter(shards.c.product_id == wanted.c.product_id, shards.c.stock >= wanted.c.quantity)
+            .order_by(func.random())
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .lateral("free_shard")
+        )
+        picked = (
+            select(wanted.c.product_id, free_shard.c.shard, wanted.c.quantity)
+            .join_from(wanted, free_shard, true())
+            .cte("picked")
+            .prefix_with("MATERIALIZED")
+        )
+    else:
+        # No row locks to skip elsewhere (SQLite serializes writers), just a random shard with enough
+        need = case(quantities, value=shards.c.product_id)
+        ranked = (
+            select(
+                shards.c.product_id,
+                shards.c.shard,
+                need.label("quantity"),
+                func.row_number().over(partition_by=shards.c.product_id, order_by=func.random()).label("pick"),
+            )
+            .filter(shards.c.product_id.in_(list(quantities)), shards.c.stock >= need)
+            .subquery()
+        )
+        picked = select(ranked.c.product_id, ranked.c.shard, ranked.c.quantity).filter(ranked.c.pick == 1).cte("picked")
+
+    return (
+        update(shards)
+        .filter(shards.c.product_id == picked.c.product_id, shards.c.shard == picked.c.shard)
+        .values(stock=shards.c.stock - picked.c.quantity)
+        .returning(shards.c.product_id)
+    )
+
+
+async def take_in_lock_order(db: AsyncSession, quantities: dict) -> Optional[list]:
+    """
+    Take each product's quantity waiting for row locks, returning the ids that didn't have enough stock
+    (drained to zero instead), or None if a shard it waited for was left short and it must plan again.
+
+    A product waits for one random shard with enough, so buyers of a hot product queue per shard; only a
+    product no single shard can cover has all its shards locked and drained. Locks are taken in one
+    SELECT ordered by (product, shard), so two checkouts never each hold a shard the other waits for.
+    """
+    shards = StockShard.__table__
+    result = await db.execute(
+        select(shards.c.product_id, shards.c.shard, shards.c.stock).filter(shards.c.product_id.in_(list(quantities)))
+    )
+    stocks = {}
+    for product_id, shard, stock in result.all():
+        stocks.setdefault(product_id, []).append((shard, stock))
+
+    # Planned from that unlocked read, and checked again once locked
+    wanted, single = [], set()
+    for product_id, quantity in quantities.items():
+        enough = [shard for shard, stock in stocks.get(product_id, []) if stock >= quantity]
+        if enough:
+            wanted.append((product_id, random.choice(enough)))
+            single.add(product_id)
+        else:
+            wanted.extend((product_id, shard) for shard, _ in stocks.get(product_id, []))
+
+    remaining = dict(quantities)
+    takes = []
+    if wanted:
+        result = await db.execute(
+            select(shards.c.product_id, shards.c.shard, shards.c.stock)
+            .filter(tuple_(shards.c.product_id, shards.c.shard).in_(wanted))
+            .order_by(shards.c.product_id, shards.c.shard)
+            .with_for_update()
+        )
+        for product_id, shard, stock in result.all():
+            if product_id in single and stock < remaining[product_id]:
+                return None
+            take = min(stock, remaining[product_id])
+            if take > 0:
+                takes.append({"locked_product_id": product_id, "locked_shard": shard, "take": take})
+                remaining[product_id] -= take
+    if takes:
+        await db.execute(
+            update(shards)
+            .filter(shards.c.product_id == bindparam("locked_product_id"), shards.c.shard == bindparam("locked_shard"))
+            .values(stock=shards.c.stock - bindparam("take")),
+            takes
+        )
+    return sorted(product_id for product_id, missing in remaining.items() if missing > 0)
+
+
+class InventoryService:
+
+    # Replace a product's stock with `total`, spread over INVENTORY_SHARDS rows (caller commits)
+    async def set_stock(db: AsyncSession, product_id: int, total: int, shards: int = INVENTORY_SHARDS):
+        await InventoryService.set_stock_many(db, {product_id: total}, shards)
+
+    # Same as set_stock for many products ({product_id: total}) in one DELETE and one INSERT (caller commits)
+    async def set_stock_many(db: AsyncSession, totals: dict, shards: int = INVENTORY_SHARDS):
+        if not totals:
+            return
+        await db.execute(delete(StockShard).filter(StockShard.product_id.in_(list(totals))))
+        # Core executemany against the table: shard rows need none of the ORM's per-row bookkeeping
+        await db.execute(
+            insert(StockShard.__table__),
+            [
+                {"product_id": product_id, "shard": shard, "stock": stock}
+                for product_id, total in totals.items()
+                for shard, stock in enumerate(split_stock(total, shards))
+            ]
+        )
+
+    # Remove all stock rows of a product (caller commits)
+    async def delete_stock(db: AsyncSession, product_id: int):
+        await db.execute(delete(StockShard).filter(StockShard.product_id == product_id))
+
+    # Take ordered quantities ({product_id: quantity}) out of stock without a single hot row. Returns the ids
+    # that didn't have enough stock left; those are drained to zero instead.
+    async def decrement(db: AsyncSession, quantities: dict):
+        if not quantities:
+            return []
+
+        # Fast path, one UPDATE for every product: take each product's quantity from one random free shard.
+        # SKIP LOCKED means concurrent buyers spread over different rows and never wait. A multi-product
+        # order runs it in a savepoint, so it can let go of the shards it got before waiting for the rest.
+        fast = await db.begin_nested() if len(quantities) > 1 else None
+        result = await db.execute(take_from_free_shards(db, quantities))
+        if len(result.scalars().all()) == len(quantities):
+            if fast:
+                await fast.commit()
+            return []
+        if fast:
+            await fast.rollback()
+
+        # Slow path, when every shard with enough is busy or stock is running low. An attempt is retried
+        # only after another checkout took from the shard it waited for, so retries end once stock is
+        # taken or drained. Its savepoint lets go of the locks it got before planning again.
+        while True:
+            attempt = await db.begin_nested()
+            oversold = await take_in_lock_order(db, quantities)
+            if oversold is not None:
+                await attempt.commit()
+                return oversold
+            await attempt.rollback()
+
+    # Move the old products.stock column into stock shards for products that have none.
+    # Idempotent, so deploys run it every time (railway.toml) until the column is dropped.
+    async def backfill_legacy_stock(db: AsyncSession):
+        # Databases created after the move to shards never had the column
+        columns = await db.run_sync(
+            lambda sync_db: [column["name"] for column in inspect(sync_db.connection()).get_columns("products")]
+        )
+        if "stock" not in columns:
+            return 0
+
+        result = await db.execute(text("SELECT id, stock FROM products WHERE stock IS NOT NULL"))
+        existing = set((await db.execute(select(StockShard.product_id).distinct())).scalars().all())
+        totals = {product_id: stock for product_id, stock in result.all() if product_id not in existing}
+        await InventoryService.set_stock_many(db, totals)
+        await db.commit()
+        return len(totals)
@@ -0,0 +1,119 @@
+import io
+import os
+import csv
+import json
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import select
+from app.config.database import read_session
+from app.models.order import Order
+from app.models.order_item import OrderItem
+from app.models.payment import Payment
+
+EXPORT_FORMATS = ("csv", "ndjson")
+# Rows fetched per round trip from the server-side cursor, and roughly the rows per response chunk
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# One CSV line per order item, with its order and payment repeated
+CSV_COLUMNS = [
+    "order_id", "user_id", "order_status", "total_amount", "created_at",
+    "payment_status", "payment_provider", "stripe_session_id", "payment_ref",
+    "item_id", "product_id", "quantity", "price",
+]
+
+EXPORT_COLUMNS = (
+    Order.id, Order.user_id, Order.status, Order.total_amount, Order.created_at,
+    Payment.status, Payment.provider, Payment.stripe_session_id, Payment.payment_ref,
+    OrderItem.id, OrderItem.product_id, OrderItem.quantity, OrderItem.price,
+)
+
+
+def isoformat(value: Optional[datetime]):
+    return value.isoformat() if value else None
+
+
+def to_ndjson_order(rows) -> bytes:
+    """One order with its payment and items nested, from its consecutive export rows"""
+    first = rows[0]
+    order = {
+        "id": first[0],
+        "user_id": first[1],
+        "status": first[2],
+        "total_amount": first[3],
+        "created_at": isoformat(first[4]),
+        "payment": {
+            "status": first[5],
+            "provider": first[6],
+            "stripe_session_id": first[7],
+            "payment_ref": first[8],
+        } if first[5] is not None else None,
+        "items": [
+            {"id": row[9], "product_id": row[10], "quantity": row[11], "price": row[12]}
+            for row in rows if row[9] is not None
+        ],
+    }
+    return json.dumps(order, separators=(",", ":")).encode() + b"\n"
+
+
+class OrderExportService:
+
+    def export_query(
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        status: Optional[str] = None
+    ):
+        query = (
+            select(*EXPORT_COLUMNS)
+            .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+            .outerjoin(Payment, Payment.order_id == Order.id)
+        )
+        if created_from is not None:
+            query = query.filter(Order.created_at >= created_from)
+        if created_to is not None:
+            query = query.filter(Order.created_at < created_to)
+        if status is not None:
+            query = query.filter(Order.status == status)
+        # Rows of one order stay together, so NDJSON can nest them without buffering more than one order
+        return query.order_by(Order.created_at, Order.id, OrderItem.id)
+
+    # Stream orders matching the filters as CSV or NDJSON chunks, oldest first.
+    # Reads from the replica in its own session: the response body is produced after the request's dependencies finish.
+    async def stream_orders(
+        file_format: str,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        status: Optional[str] = None,
+        batch_size: int = EXPORT_BATCH_SIZE
+    ):
+        query = OrderExportService.export_query(created_from, created_to, status)
+
+        async with read_session() as db:
+            # Server-side cursor: rows arrive batch_size at a time instead of all at once
+            result = await db.stream(query.execution_options(yield_per=batch_size))
+
+            if file_format == "csv":
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerow(CSV_COLUMNS)
+                async for rows in result.partitions():
+                    for row in rows:
+                        writer.writerow(isoformat(value) if isinstance(value, datetime) else value for value in row)
+                    yield buffer.getvalue().encode()
+                    buffer.seek(0)
+                    buffer.truncate()
+                if buffer.tell():
+                    yield buffer.getvalue().encode()
+                return
+
+            current = []
+            async for rows in result.partitions():
+                chunk = []
+                for row in rows:
+                    if current and current[0][0] != row[0]:
+                        chunk.append(to_ndjson_order(current))
+                        current = []
+                    current.append(row)
+                if chunk:
+                    yield b"".join(chunk)
+            if current:
+                yield to_ndjson_order(current)
@@ -1,14 +1,19 @@
-from sqlalchemy.orm import Session
+from typing import Optional
+from sqlalchemy import select, insert, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from app.models.order import Order
 from app.models.order_item import OrderItem
 from app.models.payment import Payment
+from app.core.pagination import encode_cursor, decode_cursor
 
 
 class OrderService:
 
-    # Create an order from snapshotted cart data (called after payment succeeds)
-    def create_order_from_cart_data(
-        db: Session,
+    # Create an order from snapshotted cart data (called after payment succeeds).
+    # Three INSERTs whatever the order size; the caller owns the transaction and commits.
+    async def create_order_from_cart_data(
+        db: AsyncSession,
         user_id: str,
         cart_snapshot: list,
         payment_ref: str,
@@ -20,47 +25,69 @@ class OrderService:
             total_amount += item["price"] * item["quantity"]
 
         # Create the order
-        order = Order(
-            user_id=user_id,
-            total_amount=round(total_amount, 2),
-            status="paid"
+        order_id = await db.scalar(
+            insert(Order)
+            .values(user_id=user_id, total_amount=round(total_amount, 2), status="paid")
+            .returning(Order.id)
         )
-        db.add(order)
-        db.flush()  # Get order.id without committing
 
-        # Create order items from the snapshot
-        for item in cart_snapshot:
-            order_item = OrderItem(
-                order_id=order.id,
-                product_id=item["product_id"],
-                quantity=item["quantity"],
-                price=item["price"]
-            )
-            db.add(order_item)
+        # Create all order items from the snapshot in one multi-row INSERT
+        await db.execute(
+            insert(OrderItem)
+            .values([
+                {
+                    "order_id": order_id,
+                    "product_id": item["product_id"],
+                    "quantity": item["quantity"],
+                    "price": item["price"],
+                }
+                for item in cart_snapshot
+            ])
+        )
 
         # Create a payment record marked as success
-        payment = Payment(
-            order_id=order.id,
-            payment_ref=payment_ref,
-            stripe_session_id=stripe_session_id,
-            status="success",
-            provider="stripe"
+        await db.execute(
+            insert(Payment).values(
+                order_id=order_id,
+                payment_ref=payment_ref,
+                stripe_session_id=stripe_session_id,
+                status="success",
+                provider="stripe"
+            )
+        )
+
+        return order_id
+
+    # Get one page of a user's orders, newest first, plus the cursor for the next page (None on the last page)
+    async def get_user_orders(db: AsyncSession, user_id: str, limit: int = 20, cursor: Optional[str] = None):
+        query = (
+            select(Order)
+            .options(selectinload(Order.order_items))  # one extra IN query for the whole page
+            .filter(Order.user_id == user_id)
         )
-        db.add(payment)
 
-        db.commit()
-        db.refresh(order)
-        return order
+        after = decode_cursor(cursor)
+        if after:
+            query = query.filter(tuple_(Order.created_at, Order.id) < after)
+
+        # Fetch one extra row to know whether another page exists
+        query = query.order_by(Order.created_at.desc(), Order.id.desc()).limit(limit + 1)
+        result = await db.execute(query)
+        orders = result.scalars().all()
 
-    # Get all orders for a user
-    def get_user_orders(db: Session, user_id: str):
-        return db.query(Order).filter(
-            Order.user_id == user_id
-        ).order_by(Order.created_at.desc()).all()
+        if len(orders) > limit:
+            last = orders[limit - 1]
+            return orders[:limit], encode_cursor(last.created_at, last.id)
+        return orders, None
 
     # Get a single order by ID (only if it belongs to the user)
-    def get_order_by_id(db: Session, user_id: str, order_id: int):
-        return db.query(Order).filter(
-            Order.id == order_id,
-            Order.user_id == user_id
-        ).first()
+    async def get_order_by_id(db: AsyncSession, user_id: str, order_id: int):
+        result = await db.execute(
+            select(Order)
+            .options(selectinload(Order.order_items))
+            .filter(
+                Order.id == order_id,
+                Order.user_id == user_id
+            )
+        )
+        return result.scalars().first()
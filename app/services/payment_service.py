@@ -1,58 +1,82 @@
 import os
 import json
-import stripe
-from sqlalchemy.orm import Session
+import logging
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from app.config.database import recent_writes, CHECKOUT_READ_YOUR_WRITES_SECONDS
+from app.config.stripe_sdk import get_stripe
+from app.core.metrics import STRIPE_REQUEST_SECONDS
 from app.models.cart import Cart
 from app.models.product import Product
 from app.models.payment import Payment
 from app.services.order_service import OrderService
+from app.services.inventory_service import InventoryService
+from app.services.sales_rollup_service import SalesRollupService
+from app.services.catalog_cache import catalog_cache
 
-stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
+logger = logging.getLogger(__name__)
 
 
 class PaymentService:
 
     # Create a Stripe Checkout Session from the user's cart
-    def create_checkout_session(db: Session, user_id: str):
-        # 1. Fetch cart items
-        cart_items = db.query(Cart).filter(Cart.user_id == user_id).all()
+    async def create_checkout_session(db: AsyncSession, user_id: str):
+        # 1. Fetch cart items together with their products in one query
+        result = await db.execute(
+            select(Cart.product_id, Cart.quantity, Product.id, Product.name, Product.price, Product.stock)
+            .outerjoin(Product, Cart.product_id == Product.id)
+            .filter(Cart.user_id == user_id)
+            .order_by(Cart.id)
+        )
+        cart_items = result.all()
+
+        # Nothing below needs the database, don't hold the connection in a transaction during the Stripe call
+        await db.rollback()
 
         if not cart_items:
             raise HTTPException(status_code=400, detail="Cart is empty")
 
-        # 2. Validate stock and build line items
+        # 2. Validate every line before failing, so the user sees all problems at once
+        missing = [str(item.product_id) for item in cart_items if item.id is None]
+        if missing:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Products with ids {', '.join(missing)} not found"
+            )
+
+        insufficient = [
+            f"'{item.name}'. Available: {item.stock}, requested: {item.quantity}"
+            for item in cart_items
+            if item.stock < item.quantity
+        ]
+        if insufficient:
+            raise HTTPException(
+                status_code=400,
+                detail="Insufficient stock for " + "; ".join(insufficient)
+            )
+
+        # Build line items and the snapshot from the same result set
         line_items = []
         cart_snapshot = []
 
         for item in cart_items:
-            product = db.query(Product).filter(Product.id == item.product_id).first()
-            if not product:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"Product with id {item.product_id} not found"
-                )
-            if product.stock < item.quantity:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Insufficient stock for '{product.name}'. Available: {product.stock}, requested: {item.quantity}"
-                )
-
             line_items.append({
                 "price_data": {
                     "currency": "usd",
                     "product_data": {
-                        "name": product.name,
+                        "name": item.name,
                     },
-                    "unit_amount": int(product.price * 100),  # Stripe expects cents
+                    "unit_amount": int(item.price * 100),  # Stripe expects cents
                 },
                 "quantity": item.quantity,
             })
 
             cart_snapshot.append({
-                "product_id": product.id,
+                "product_id": item.id,
                 "quantity": item.quantity,
-                "price": product.price,
+                "price": item.price,
             })
 
         # 3. Create Stripe Checkout Session
@@ -62,35 +86,43 @@ class PaymentService:
         )
         cancel_url = os.getenv("STRIPE_CANCEL_URL", "http://localhost:5173/cart")
 
+        # The Stripe SDK is blocking, keep it off the event loop
+        stripe = get_stripe()
         try:
-            session = stripe.checkout.Session.create(
-                payment_method_types=["card"],
-                line_items=line_items,
-                mode="payment",
-                success_url=success_url,
-                cancel_url=cancel_url,
-                metadata={
-                    "user_id": user_id,
-                    "cart_snapshot": json.dumps(cart_snapshot),
-                },
-            )
+            with STRIPE_REQUEST_SECONDS.time("checkout.session.create"):
+                session = await run_in_threadpool(
+                    stripe.checkout.Session.create,
+                    payment_method_types=["card"],
+                    line_items=line_items,
+                    mode="payment",
+                    success_url=success_url,
+                    cancel_url=cancel_url,
+                    metadata={
+                        "user_id": user_id,
+                        "cart_snapshot": json.dumps(cart_snapshot),
+                    },
+                )
         except stripe.StripeError as e:
             raise HTTPException(status_code=502, detail=f"Stripe error: {str(e)}")
 
+        # Paying leads to an order and an emptied cart, written by whichever worker fulfils the webhook
+        recent_writes.mark(user_id, CHECKOUT_READ_YOUR_WRITES_SECONDS)
+
         return {
             "checkout_url": session.url,
             "session_id": session.id,
         }
 
     # Handle the checkout.session.completed webhook event
-    def handle_checkout_completed(db: Session, session: dict):
+    async def handle_checkout_completed(db: AsyncSession, session: dict):
         stripe_session_id = session["id"]
         payment_intent_id = session.get("payment_intent")
 
-        # Idempotency check: skip if already processed
-        existing = db.query(Payment).filter(
-            Payment.stripe_session_id == stripe_session_id
-        ).first()
+        # Idempotency check: skip if already processed (the unique session id also
+        # makes a concurrent duplicate fail at the payment INSERT and roll back)
+        existing = await db.scalar(
+            select(Payment.id).filter(Payment.stripe_session_id == stripe_session_id)
+        )
         if existing:
             return
 
@@ -104,18 +136,29 @@ class PaymentService:
 
         cart_snapshot = json.loads(cart_snapshot_raw)
 
+        # Everything below is one transaction: order, items, payment, sales rollups, stock and cart commit together
+
         # Create the order + order items + payment
-        OrderService.create_order_from_cart_data(
+        order_id = await OrderService.create_order_from_cart_data(
             db, user_id, cart_snapshot, payment_intent_id, stripe_session_id
         )
 
-        # Decrement product stock
+        # Add the order to the daily sales rollups the admin reports read
+        await SalesRollupService.record_order(db, order_id)
+
+        # Decrement product stock from the sharded counters (conditional UPDATEs, no read-modify-write)
+        quantities = {}
         for item in cart_snapshot:
-            product = db.query(Product).filter(Product.id == item["product_id"]).first()
-            if product:
-                product.stock = max(0, product.stock - item["quantity"])
+            quantities[item["product_id"]] = quantities.get(item["product_id"], 0) + item["quantity"]
+        oversold = await InventoryService.decrement(db, quantities)
+        if oversold:
+            logger.warning("Checkout session %s oversold products %s", stripe_session_id, oversold)
 
         # Clear the user's cart
-        db.query(Cart).filter(Cart.user_id == user_id).delete()
+        await db.execute(delete(Cart).filter(Cart.user_id == user_id))
+
+        await db.commit()
+        recent_writes.mark(user_id)
 
-        db.commit()
+        # Stock changed, cached catalog responses are now stale in every worker
+        await catalog_cache.publish(db, stock_only=True)
@@ -0,0 +1,137 @@
+import os
+import csv
+import json
+import codecs
+import logging
+from typing import AsyncIterator
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.schemas.product import ProductCreate
+from app.services.product_service import ProductService
+from app.services.inventory_service import InventoryService
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ("csv", "ndjson")
+# Rows written per multi-row INSERT and commit; memory stays flat at about one batch
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+# Errors listed in the report; further failures are only counted
+MAX_REPORTED_ERRORS = 1000
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]):
+    """Split a stream of UTF-8 byte chunks into lines without holding more than one line"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()  # spreadsheets like to start CSVs with a BOM
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def iter_rows(lines: AsyncIterator[str], file_format: str):
+    """
+    Yield (row number, fields) for every record; fields is an error message for rows that don't parse.
+
+    CSV needs a header line naming the ProductCreate fields; empty cells fall back to the field default.
+    """
+    number = 0
+
+    if file_format == "ndjson":
+        async for line in lines:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                fields = json.loads(line)
+            except ValueError:
+                yield number, "Invalid JSON"
+                continue
+            yield number, fields if isinstance(fields, dict) else "Expected a JSON object"
+        return
+
+    header = None
+    record, quotes = [], 0
+    async for line in lines:
+        record.append(line)
+        quotes += line.count('"')
+        # An odd number of quotes means the line break is inside a quoted field
+        if quotes % 2:
+            continue
+        text = "\n".join(record)
+        record, quotes = [], 0
+        if not text.strip():
+            continue
+
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+
+        number += 1
+        if len(values) != len(header):
+            yield number, f"Expected {len(header)} fields, got {len(values)}"
+            continue
+        yield number, {name: value for name, value in zip(header, values) if value != ""}
+
+    if record:
+        yield number + 1, "Unterminated quoted field"
+
+
+class ProductImportService:
+
+    # Stream products from CSV or NDJSON chunks into the catalog, upserting by SKU, one commit per batch.
+    # Returns a report with the imported/failed counts and the first MAX_REPORTED_ERRORS row errors.
+    async def import_products(
+        db: AsyncSession,
+        chunks: AsyncIterator[bytes],
+        file_format: str,
+        batch_size: int = IMPORT_BATCH_SIZE
+    ):
+        report = {"imported": 0, "failed": 0, "errors": []}
+        batch = []
+
+        def fail(row: int, error: str):
+            report["failed"] += 1
+            if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                report["errors"].append({"row": row, "error": error})
+
+        async def write_batch():
+            try:
+                product_ids = await ProductService.upsert_products(db, [product for _, product in batch])
+                await InventoryService.set_stock_many(
+                    db, {product_id: product.stock for product_id, (_, product) in zip(product_ids, batch)}
+                )
+                await db.commit()
+                report["imported"] += len(batch)
+            except SQLAlchemyError as e:
+                # Earlier batches are already committed; this one is reported row by row
+                await db.rollback()
+                logger.warning("Product import batch failed: %s", e)
+                for row, _ in batch:
+                    fail(row, "Batch write failed")
+            batch.clear()
+
+        async for row, fields in iter_rows(iter_lines(chunks), file_format):
+            if isinstance(fields, str):
+                fail(row, fields)
+                continue
+            try:
+                batch.append((row, ProductCreate.model_validate(fields)))
+            except ValidationError as e:
+                fail(row, "; ".join(
+                    f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+                ))
+                continue
+            if len(batch) >= batch_size:
+                await write_batch()
+
+        if batch:
+            await write_batch()
+
+        return report
@@ -1,53 +1,144 @@
-from sqlalchemy.orm import Session
+from typing import List, Optional
+from sqlalchemy import select, insert, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config.database import dialect_insert
 from app.models.product import Product
+from app.models.inventory import StockShard
 from app.schemas.product import ProductCreate, ProductUpdate
+from app.core.pagination import encode_cursor, decode_cursor
+from app.services.inventory_service import InventoryService
+
+# Everything ProductOut needs, in its field order, for pages serialized straight from rows
+PRODUCT_OUT_COLUMNS = (
+    Product.id,
+    Product.name,
+    Product.sku,
+    Product.description,
+    Product.price,
+    Product.stock,
+    Product.image_url,
+    Product.category,
+    Product.created_at,
+)
 
 
 class ProductService:
 
-    # Get all products from database
-    def get_all_products(db: Session):
-        return db.query(Product).all()
+    # Get one page of products, newest first, plus the cursor for the next page (None on the last page).
+    # With `columns`, the page holds rows of those columns (which must include created_at and id) instead of Products.
+    async def get_all_products(
+        db: AsyncSession,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        category: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        in_stock: bool = False,
+        columns: Optional[tuple] = None
+    ):
+        query = select(*columns) if columns else select(Product)
+
+        if category is not None:
+            query = query.filter(Product.category == category)
+        if min_price is not None:
+            query = query.filter(Product.price >= min_price)
+        if max_price is not None:
+            query = query.filter(Product.price <= max_price)
+        if in_stock:
+            # Probes each candidate's shards through their primary key and stops at the first with stock,
+            # so the cost grows as the in-stock share shrinks (benchmarks/in_stock_listing.py). A partial
+            # index on stock > 0 would make every stock decrement a non-HOT update, so there isn't one.
+            query = query.filter(
+                select(StockShard.product_id).filter(StockShard.product_id == Product.id, StockShard.stock > 0).exists()
+            )
+
+        # Keyset pagination: seek past the last row of the previous page instead of OFFSET
+        after = decode_cursor(cursor)
+        if after:
+            query = query.filter(tuple_(Product.created_at, Product.id) < after)
+
+        # Fetch one extra row to know whether another page exists
+        query = query.order_by(Product.created_at.desc(), Product.id.desc()).limit(limit + 1)
+        result = await db.execute(query)
+        products = result.all() if columns else result.scalars().all()
+
+        if len(products) > limit:
+            last = products[limit - 1]
+            return products[:limit], encode_cursor(last.created_at, last.id)
+        return products, None
 
     # Get a single product by its id
-    def get_product_by_id(db: Session, product_id: int):
-        return db.query(Product).filter(Product.id == product_id).first()
+    async def get_product_by_id(db: AsyncSession, product_id: int):
+        return await db.get(Product, product_id)
 
     # Create a new product
-    def create_product(db: Session, product_data: ProductCreate):
+    async def create_product(db: AsyncSession, product_data: ProductCreate):
         new_product = Product(
             name=product_data.name,
+            sku=product_data.sku,
             description=product_data.description,
             price=product_data.price,
-            stock=product_data.stock,
             image_url=product_data.image_url,
             category=product_data.category
         )
         db.add(new_product)
-        db.commit()
-        db.refresh(new_product)
+        await db.flush()
+        await InventoryService.set_stock(db, new_product.id, product_data.stock)
+        await db.commit()
+        await db.refresh(new_product)
         return new_product
 
+    # Insert or update many products in one multi-row statement per kind. Rows with a SKU update the
+    # product that already has it; the rest are inserted. Returns the ids in row order (caller commits).
+    async def upsert_products(db: AsyncSession, products: List[ProductCreate]):
+        rows = [product.model_dump(exclude={"stock"}) for product in products]
+
+        # One row per SKU; a later row in the batch wins, like it would across batches
+        by_sku = {row["sku"]: row for row in rows if row["sku"] is not None}
+        ids_by_sku = {}
+        if by_sku:
+            upsert = dialect_insert(db, Product)
+            upsert = upsert.on_conflict_do_update(
+                index_elements=[Product.sku],
+                set_={column: upsert.excluded[column] for column in rows[0] if column != "sku"}
+            )
+            result = await db.execute(upsert.returning(Product.id, Product.sku), list(by_sku.values()))
+            ids_by_sku = {sku: product_id for product_id, sku in result}
+
+        new_ids = iter(())
+        new_rows = [row for row in rows if row["sku"] is None]
+        if new_rows:
+            result = await db.execute(
+                insert(Product).returning(Product.id, sort_by_parameter_order=True), new_rows
+            )
+            new_ids = iter(result.scalars().all())
+
+        return [ids_by_sku[row["sku"]] if row["sku"] is not None else next(new_ids) for row in rows]
+
     # Update an existing product (only updates fields that are provided)
-    def update_product(db: Session, product_id: int, product_data: ProductUpdate):
-        product = db.query(Product).filter(Product.id == product_id).first()
+    async def update_product(db: AsyncSession, product_id: int, product_data: ProductUpdate):
+        product = await db.get(Product, product_id)
         if not product:
             return None
 
         update_data = product_data.model_dump(exclude_unset=True)
+        stock = update_data.pop("stock", None)
+        if stock is not None:
+            await InventoryService.set_stock(db, product_id, stock)
         for key, value in update_data.items():
             setattr(product, key, value)
 
-        db.commit()
-        db.refresh(product)
+        await db.commit()
+        await db.refresh(product)
         return product
 
     # Delete a product
-    def delete_product(db: Session, product_id: int):
-        product = db.query(Product).filter(Product.id == product_id).first()
+    async def delete_product(db: AsyncSession, product_id: int):
+        product = await db.get(Product, product_id)
         if not product:
             return False
 
-        db.delete(product)
-        db.commit()
+        await InventoryService.delete_stock(db, product_id)
+        await db.delete(product)
+        await db.commit()
         return True
@@ -0,0 +1,134 @@
+import os
+import random
+from datetime import date, datetime, time, timezone
+from typing import Optional
+from sqlalchemy import select, delete, insert, func, cast, literal, literal_column, distinct, text, Date
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config.database import dialect_insert
+from app.models.order import Order
+from app.models.order_item import OrderItem
+from app.models.product import Product
+from app.models.sales_rollup import ProductSalesDaily, CategorySalesDaily
+
+# Rows per rollup day and key. More shards let more concurrent checkouts of one product record their sale in parallel.
+SALES_ROLLUP_SHARDS = int(os.getenv("SALES_ROLLUP_SHARDS", "8"))
+
+
+# Constants in grouped expressions are rendered inline, so the SELECT list and GROUP BY match textually
+def order_day(db: AsyncSession):
+    """The UTC calendar day of Order.created_at, as SQL"""
+    if db.bind.dialect.name == "postgresql":
+        return cast(func.timezone(literal_column("'UTC'"), Order.created_at), Date)
+    # SQLite stores CURRENT_TIMESTAMP as UTC text
+    return func.date(Order.created_at)
+
+
+def rollup_queries(db: AsyncSession, shard: int):
+    """(rollup table, key column, SELECT of its rows from all orders) for the product and the category rollups"""
+    day = order_day(db)
+    totals = (
+        func.sum(OrderItem.quantity),
+        func.sum(OrderItem.quantity * OrderItem.price),
+        func.count(distinct(Order.id)),
+    )
+    category = func.coalesce(Product.category, literal_column("''"))
+    return [
+        (
+            ProductSalesDaily, ProductSalesDaily.product_id,
+            select(day, OrderItem.product_id, literal(shard), *totals)
+            .join(Order, Order.id == OrderItem.order_id)
+            .group_by(day, OrderItem.product_id)
+            .order_by(day, OrderItem.product_id)
+        ),
+        (
+            CategorySalesDaily, CategorySalesDaily.category,
+            select(day, category, literal(shard), *totals)
+            .join(Order, Order.id == OrderItem.order_id)
+            .outerjoin(Product, Product.id == OrderItem.product_id)
+            .group_by(day, category)
+            .order_by(day, category)
+        ),
+    ]
+
+
+class SalesRollupService:
+
+    # Add one order's items to the daily rollups, in the transaction that creates the order (caller commits).
+    # Two INSERT ... SELECT upserts whatever the order size; rows are written in key order so concurrent
+    # checkouts lock them in the same order.
+    async def record_order(db: AsyncSession, order_id: int):
+        shard = random.randrange(SALES_ROLLUP_SHARDS)
+        for table, key, query in rollup_queries(db, shard):
+            columns = [table.day, key, table.shard, table.units, table.revenue, table.orders]
+            upsert = dialect_insert(db, table).from_select(columns, query.filter(Order.id == order_id))
+            await db.execute(
+                upsert.on_conflict_do_update(
+                    index_elements=[table.day, key, table.shard],
+                    set_={
+                        "units": table.units + upsert.excluded.units,
+                        "revenue": table.revenue + upsert.excluded.revenue,
+                        "orders": table.orders + upsert.excluded.orders,
+                    }
+                )
+            )
+
+    # Recompute the rollups from orders, for every day or from `since` on, in one transaction.
+    # For backfilling and repairs; returns the number of rollup rows written.
+    async def rebuild(db: AsyncSession, since: Optional[date] = None):
+        if db.bind.dialect.name == "postgresql":
+            # Checkouts block on their rollup upsert until the rebuild commits, then add to the rebuilt rows,
+            # so orders committing meanwhile are counted exactly once
+            await db.execute(text(
+                f"LOCK TABLE {ProductSalesDaily.__tablename__}, {CategorySalesDaily.__tablename__} IN EXCLUSIVE MODE"
+            ))
+
+        written = 0
+        for table, key, query in rollup_queries(db, 0):
+            cleared = delete(table)
+            if since is not None:
+                cleared = cleared.filter(table.day >= since)
+                query = query.filter(Order.created_at >= datetime.combine(since, time.min, timezone.utc))
+            await db.execute(cleared)
+            columns = [table.day, key, table.shard, table.units, table.revenue, table.orders]
+            result = await db.execute(insert(table).from_select(columns, query))
+            written += result.rowcount
+        await db.commit()
+        return written
+
+    # Units, revenue and order count per product over [date_from, date_to], best sellers by revenue first
+    async def product_sales(db: AsyncSession, date_from: date, date_to: date, limit: int = 50):
+        revenue = func.sum(ProductSalesDaily.revenue)
+        result = await db.execute(
+            select(
+                ProductSalesDaily.product_id,
+                func.sum(ProductSalesDaily.units).label("units"),
+                revenue.label("revenue"),
+                func.sum(ProductSalesDaily.orders).label("orders"),
+            )
+            .filter(ProductSalesDaily.day >= date_from, ProductSalesDaily.day <= date_to)
+            .group_by(ProductSalesDaily.product_id)
+            .order_by(revenue.desc(), ProductSalesDaily.product_id)
+            .limit(limit)
+        )
+        return result.all()
+
+    # Units, revenue and order count per category per day over [date_from, date_to], oldest day first
+    async def category_sales(db: AsyncSession, date_from: date, date_to: date, category: Optional[str] = None):
+        query = (
+            select(
+                CategorySalesDaily.day,
+                CategorySalesDaily.category,
+                func.sum(CategorySalesDaily.units).label("units"),
+                func.sum(CategorySalesDaily.revenue).label("revenue"),
+                func.sum(CategorySalesDaily.orders).label("orders"),
+            )
+            .filter(CategorySalesDaily.day >= date_from, CategorySalesDaily.day <= date_to)
+        )
+        if category is not None:
+            query = query.filter(CategorySalesDaily.category == category)
+        result = await db.execute(
+            query
+            .group_by(CategorySalesDaily.day, CategorySalesDaily.category)
+            .order_by(CategorySalesDaily.day, CategorySalesDaily.category)
+        )
+        return result.all()
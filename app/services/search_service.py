@@ -0,0 +1,110 @@
+import os
+import re
+import time
+import asyncio
+from collections import defaultdict
+from sqlalchemy import select, func, literal_column
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.product import Product, search_vector
+from app.services.catalog_cache import catalog_cache
+
+# "postgres" or "memory"; unset picks by database dialect
+SEARCH_ENGINE = os.getenv("SEARCH_ENGINE")
+
+# Field weights for the in-memory engine, mirroring the A/B/C weights of the Postgres index
+FIELD_WEIGHTS = (("name", 3.0), ("category", 2.0), ("description", 1.0))
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str):
+    return TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+class InMemorySearchIndex:
+    """
+    Inverted index over product text for databases without full-text search (SQLite, tests).
+
+    Built from the catalog on first use and rebuilt when this worker changes product text
+    (catalog_cache.text_version; stock-only writes like checkouts leave it alone), and at least
+    every `ttl` seconds for changes made by other workers, like the catalog cache itself.
+    Results are loaded from the database, so deleted products drop out straight away.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.version = None
+        self.expires_at = 0.0
+        self._postings = {}
+        self._lock = asyncio.Lock()
+
+    def _fresh(self) -> bool:
+        return self.version == catalog_cache.text_version and self.expires_at > time.monotonic()
+
+    async def _ensure_built(self, db: AsyncSession):
+        if self._fresh():
+            return
+        async with self._lock:
+            if self._fresh():
+                return
+            version = catalog_cache.text_version
+            expires_at = time.monotonic() + self.ttl
+            result = await db.execute(
+                select(Product.id, Product.name, Product.category, Product.description)
+            )
+            postings = defaultdict(dict)
+            for row in result:
+                for field, weight in FIELD_WEIGHTS:
+                    for token in tokenize(getattr(row, field)):
+                        postings[token][row.id] = postings[token].get(row.id, 0.0) + weight
+            self._postings = dict(postings)
+            self.version = version
+            self.expires_at = expires_at
+
+    async def search(self, db: AsyncSession, q: str, limit: int, offset: int):
+        """Product ids matching every term of `q`, best score first"""
+        await self._ensure_built(db)
+        terms = set(tokenize(q))
+        if not terms:
+            return []
+
+        # Intersect from the rarest term up, so the candidate set shrinks as fast as possible
+        postings = sorted((self._postings.get(term, {}) for term in terms), key=len)
+        scores = dict(postings[0])
+        for posting in postings[1:]:
+            scores = {product_id: score + posting[product_id] for product_id, score in scores.items() if product_id in posting}
+            if not scores:
+                return []
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [product_id for product_id, _ in ranked[offset:offset + limit]]
+
+
+memory_index = InMemorySearchIndex(ttl=catalog_cache.ttl)
+
+
+class SearchService:
+
+    # Ranked full-text search over product name, category and description
+    async def search_products(db: AsyncSession, q: str, limit: int = 20, offset: int = 0):
+        engine = SEARCH_ENGINE or ("postgres" if db.bind.dialect.name == "postgresql" else "memory")
+
+        if engine == "postgres":
+            vector = search_vector(Product.name, Product.description, Product.category)
+            query = func.websearch_to_tsquery(literal_column("'english'::regconfig"), q)
+            rank = func.ts_rank_cd(vector, query)
+            result = await db.execute(
+                select(Product)
+                .filter(vector.op("@@")(query))
+                .order_by(rank.desc(), Product.id)
+                .limit(limit)
+                .offset(offset)
+            )
+            return result.scalars().all()
+
+        product_ids = await memory_index.search(db, q, limit, offset)
+        if not product_ids:
+            return []
+        result = await db.execute(select(Product).filter(Product.id.in_(product_ids)))
+        products = {product.id: product for product in result.scalars()}
+        return [products[product_id] for product_id in product_ids if product_id in products]
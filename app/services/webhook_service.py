@@ -0,0 +1,135 @@
+import os
+import json
+import random
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config.database import AsyncSessionLocal, dialect_insert
+from app.models.webhook_event import WebhookEvent
+from app.services.payment_service import PaymentService
+
+logger = logging.getLogger(__name__)
+
+# Event types we act on; anything else is acknowledged without being stored
+HANDLED_EVENTS = {"checkout.session.completed"}
+
+MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8"))
+RETRY_BASE_SECONDS = float(os.getenv("WEBHOOK_RETRY_BASE_SECONDS", "2"))
+RETRY_MAX_SECONDS = float(os.getenv("WEBHOOK_RETRY_MAX_SECONDS", "600"))
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter: ~2s, 4s, 8s ... capped at RETRY_MAX_SECONDS"""
+    delay = min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.5, 1.0)
+
+
+class WebhookService:
+
+    # Persist a verified event in the inbox. Returns False if it was already stored (Stripe redelivery).
+    async def store_event(db: AsyncSession, event_id: str, event_type: str, payload: bytes):
+        result = await db.execute(
+            dialect_insert(db, WebhookEvent)
+            .values(id=event_id, type=event_type, payload=payload.decode(), status="pending", attempts=0)
+            .on_conflict_do_nothing(index_elements=["id"])
+        )
+        await db.commit()
+        return result.rowcount > 0
+
+    # Claim one due event, process it and mark it done, all in one transaction.
+    # Returns False when there was nothing to do.
+    async def process_next(db: AsyncSession):
+        now = datetime.now(timezone.utc)
+        # SKIP LOCKED: concurrent workers each get a different event instead of queueing on the same row
+        event = await db.scalar(
+            select(WebhookEvent)
+            .filter(WebhookEvent.status == "pending", WebhookEvent.next_attempt_at <= now)
+            .order_by(WebhookEvent.next_attempt_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        if event is None:
+            await db.rollback()
+            return False
+
+        event_id = event.id
+        attempts = event.attempts + 1
+        try:
+            event.status = "done"
+            event.attempts = attempts
+            event.processed_at = now
+            await db.flush()
+
+            # The inbox row commits together with the order, so an event can't be half applied
+            if event.type == "checkout.session.completed":
+                await PaymentService.handle_checkout_completed(db, json.loads(event.payload)["data"]["object"])
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            failed = attempts >= MAX_ATTEMPTS
+            logger.exception("Webhook event %s failed (attempt %s%s)", event_id, attempts, ", giving up" if failed else "")
+            await db.execute(
+                update(WebhookEvent)
+                .filter(WebhookEvent.id == event_id)
+                .values(
+                    status="failed" if failed else "pending",
+                    attempts=attempts,
+                    next_attempt_at=now + timedelta(seconds=retry_delay(attempts)),
+                    last_error=str(e)[:1000],
+                )
+            )
+            await db.commit()
+        return True
+
+
+class WebhookWorkerPool:
+    """
+    Background tasks draining the webhook inbox.
+
+    Workers sleep until the webhook endpoint signals a new event (or the poll interval
+    passes, which also picks up retries that have come due), then process events until
+    the inbox is empty.
+    """
+
+    def __init__(self, workers: int = 2, poll_interval: float = 5):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._wakeup = asyncio.Event()
+        self._tasks = []
+
+    def notify(self):
+        self._wakeup.set()
+
+    def start(self):
+        for n in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._run(), name=f"webhook-worker-{n}"))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self):
+        while True:
+            try:
+                async with AsyncSessionLocal() as db:
+                    processed = await WebhookService.process_next(db)
+            except Exception:
+                logger.exception("Webhook worker failed to poll the inbox")
+                processed = False
+
+            if not processed:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+
+webhook_workers = WebhookWorkerPool(
+    workers=int(os.getenv("WEBHOOK_WORKERS", "2")),
+    poll_interval=float(os.getenv("WEBHOOK_POLL_INTERVAL", "5")),
+)
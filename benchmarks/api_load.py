@@ -0,0 +1,387 @@
+"""
+End-to-end API load test that runs fully offline.
+
+Boots the app in-process (httpx's ASGI transport, no server, no network) against SQLite or a
+local Postgres. Firebase token verification and the Stripe API are swapped for local
+stand-ins, so the run exercises every layer of the app except those two services:
+
+- Tokens are "bench-..." user ids and are accepted without a signature check.
+- Checkout Sessions are made up locally after --stripe-latency-ms.
+- Webhooks are signed with a local secret and go through the real signature check.
+
+It seeds a catalog, users and their carts, then drives these scenarios:
+
+    browse          list products (and a second page), open one, search
+    add-to-cart     add a product, read the cart back
+    checkout        add a product, create a checkout session, deliver its webhook
+    webhook-burst   deliver --burst completed-checkout webhooks at once, wait until fulfilled
+
+For each request type it reports p50/p95/p99 latency, requests per second and SQL statements
+per request. Save a run and compare a later one against it to measure a change:
+
+    python -m benchmarks.api_load --save baseline.json
+    python -m benchmarks.api_load --compare baseline.json
+
+Without DATABASE_URL it uses a throwaway SQLite file. For Postgres, point DATABASE_URL at an
+empty scratch database: the run adds rows and checkouts take stock.
+QUERY_BUDGET_MODE defaults to raise here, so a route going over its query budget shows up as errors.
+"""
+import os
+import sys
+import json
+import hmac
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+import tempfile
+import itertools
+from types import SimpleNamespace
+from contextvars import ContextVar
+from collections import defaultdict
+
+SCENARIOS = ("browse", "add-to-cart", "checkout", "webhook-burst")
+CATEGORIES = ["lips", "eyes", "face", "skin", "hair", "body", "nails", "fragrance"]
+WORDS = ["rose", "matte", "velvet", "glow", "hydrating", "organic", "shea", "argan", "silk", "amber", "citrus", "mint"]
+WEBHOOK_SECRET = "whsec_benchmark"
+
+# Statements run by the request the current task is making (the ASGI app runs in the caller's task)
+request_statements: ContextVar = ContextVar("request_statements", default=None)
+
+
+def configure_environment(args):
+    """Settings the app reads at import time; must run before anything under app/ is imported"""
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='elavid-bench-')}/bench.sqlite")
+    os.environ.setdefault("QUERY_BUDGET_MODE", "raise")
+    os.environ["STRIPE_WEBHOOK_SECRET"] = WEBHOOK_SECRET
+    os.environ["STRIPE_SECRET_KEY"] = "sk_test_benchmark"
+    os.environ.pop("DATABASE_REPLICA_URL", None)
+
+
+class FakeTokenVerifier:
+    """Stands in for TokenVerifier: a "bench-..." token is the uid itself"""
+
+    async def verify_async(self, token: str) -> dict:
+        from app.config.firebase_auth import InvalidTokenError
+        if not token.startswith("bench-"):
+            raise InvalidTokenError("Not a benchmark token")
+        return {"uid": token, "sub": token, "email": f"{token}@bench.local", "name": token}
+
+
+class FakeStripe:
+    """Stands in for stripe.checkout.Session.create, remembering each session for its webhook"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.sessions = {}
+        self._ids = itertools.count(1)
+
+    def create_session(self, **params):
+        # Called on the threadpool like the real SDK, so sleeping models the blocking HTTP call
+        time.sleep(self.latency)
+        return SimpleNamespace(**self.add_session(params["metadata"]))
+
+    def add_session(self, metadata: dict) -> dict:
+        n = next(self._ids)
+        session = {
+            "id": f"cs_bench_{os.getpid()}_{n}",
+            "url": f"https://checkout.stripe.test/{n}",
+            "payment_intent": f"pi_bench_{os.getpid()}_{n}",
+            "metadata": metadata,
+        }
+        self.sessions[session["id"]] = session
+        return session
+
+
+def signed_webhook(session: dict):
+    event = {"id": f"evt_{session['id']}", "type": "checkout.session.completed", "data": {"object": session}}
+    body = json.dumps(event)
+    timestamp = int(time.time())
+    signature = hmac.new(WEBHOOK_SECRET.encode(), f"{timestamp}.{body}".encode(), hashlib.sha256).hexdigest()
+    return body, {"stripe-signature": f"t={timestamp},v1={signature}", "content-type": "application/json"}
+
+
+def percentile(values, p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+class Bench:
+    def __init__(self, client, args, run_id: str):
+        self.client = client
+        self.args = args
+        self.run_id = run_id
+        self.rng = random.Random(args.seed)
+        self.stripe = FakeStripe(args.stripe_latency_ms / 1000)
+        self.products = []  # (id, price)
+        self.users = []
+        self.samples = defaultdict(list)  # request name -> [(seconds, statements)]
+        self.errors = defaultdict(int)
+        self.first_errors = {}
+
+    def headers(self, user: str) -> dict:
+        return {"Authorization": f"Bearer {user}"}
+
+    async def request(self, name: str, method: str, url: str, **kwargs):
+        statements = [0]
+        token = request_statements.set(statements)
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except Exception as e:
+            self.errors[name] += 1
+            self.first_errors.setdefault(name, repr(e))
+            return None
+        finally:
+            elapsed = time.perf_counter() - start
+            request_statements.reset(token)
+        self.samples[name].append((elapsed, statements[0]))
+        if response.status_code >= 400:
+            self.errors[name] += 1
+            self.first_errors.setdefault(name, f"{response.status_code} {response.text[:200]}")
+        return response
+
+    # Scenarios: one iteration of a virtual user
+
+    async def browse(self, user: str):
+        category = self.rng.choice(CATEGORIES + [None])
+        params = {"limit": 20, **({"category": category} if category else {})}
+        response = await self.request("GET /products/", "GET", "/api/v1/products/", params=params)
+        cursor = response is not None and response.headers.get("x-next-cursor")
+        if cursor:
+            await self.request("GET /products/ (page 2)", "GET", "/api/v1/products/", params={**params, "cursor": cursor})
+        product_id, _ = self.rng.choice(self.products)
+        await self.request("GET /products/{id}", "GET", f"/api/v1/products/{product_id}")
+        await self.request("GET /products/search", "GET", "/api/v1/products/search", params={"q": self.rng.choice(WORDS)})
+
+    async def add_to_cart(self, user: str):
+        product_id, _ = self.rng.choice(self.products)
+        await self.request(
+            "POST /cart/add", "POST", "/api/v1/cart/add",
+            json={"product_id": product_id, "quantity": 1}, headers=self.headers(user)
+        )
+        await self.request("GET /cart/", "GET", "/api/v1/cart/", headers=self.headers(user))
+
+    async def checkout(self, user: str):
+        product_id, _ = self.rng.choice(self.products)
+        await self.request(
+            "POST /cart/add", "POST", "/api/v1/cart/add",
+            json={"product_id": product_id, "quantity": 1}, headers=self.headers(user)
+        )
+        response = await self.request("POST /payments/checkout", "POST", "/api/v1/payments/checkout", headers=self.headers(user))
+        if response is None or response.status_code != 200:
+            return
+        body, headers = signed_webhook(self.stripe.sessions[response.json()["session_id"]])
+        await self.request("POST /payments/webhook/stripe", "POST", "/api/v1/payments/webhook/stripe", content=body, headers=headers)
+
+    async def run_for(self, scenario, duration: float, concurrency: int) -> float:
+        deadline = time.perf_counter() + duration
+
+        async def virtual_user(user: str):
+            while time.perf_counter() < deadline:
+                await scenario(user)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(virtual_user(self.users[n % len(self.users)]) for n in range(concurrency)))
+        return time.perf_counter() - start
+
+    async def webhook_burst(self, count: int, concurrency: int):
+        """Deliver `count` checkout webhooks at once; returns (delivery seconds, seconds until all fulfilled)"""
+        from sqlalchemy import select, func
+        from app.config.database import AsyncSessionLocal
+        from app.models.webhook_event import WebhookEvent
+
+        sessions = []
+        for _ in range(count):
+            lines = self.rng.sample(self.products, self.rng.randint(1, 3))
+            snapshot = [{"product_id": product_id, "quantity": 1, "price": price} for product_id, price in lines]
+            sessions.append(self.stripe.add_session({
+                "user_id": self.rng.choice(self.users),
+                "cart_snapshot": json.dumps(snapshot),
+            }))
+
+        queue = asyncio.Queue()
+        for session in sessions:
+            queue.put_nowait(signed_webhook(session))
+
+        async def deliver():
+            while not queue.empty():
+                body, headers = queue.get_nowait()
+                await self.request("POST /payments/webhook/stripe (burst)", "POST", "/api/v1/payments/webhook/stripe",
+                                    content=body, headers=headers)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(deliver() for _ in range(concurrency)))
+        delivered = time.perf_counter() - start
+
+        while True:
+            async with AsyncSessionLocal() as db:
+                pending = await db.scalar(
+                    select(func.count()).select_from(WebhookEvent).filter(WebhookEvent.status == "pending")
+                )
+            if not pending:
+                break
+            await asyncio.sleep(0.05)
+        return delivered, time.perf_counter() - start
+
+
+async def seed(bench: Bench, products: int, users: int):
+    from sqlalchemy import insert
+    from app.config.database import AsyncSessionLocal
+    from app.models.user import User
+    from app.models.cart import Cart
+    from app.schemas.product import ProductCreate
+    from app.services.product_service import ProductService
+    from app.services.inventory_service import InventoryService
+
+    rng = bench.rng
+    async with AsyncSessionLocal() as db:
+        for start in range(0, products, 1000):
+            batch = [
+                ProductCreate(
+                    sku=f"bench-{bench.run_id}-{n}",
+                    name=f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} {rng.choice(CATEGORIES)} {n}",
+                    description=" ".join(rng.choice(WORDS) for _ in range(12)),
+                    price=round(rng.uniform(3, 80), 2),
+                    stock=10 ** 6,
+                    category=rng.choice(CATEGORIES),
+                )
+                for n in range(start, min(start + 1000, products))
+            ]
+            ids = await ProductService.upsert_products(db, batch)
+            await InventoryService.set_stock_many(db, {product_id: p.stock for product_id, p in zip(ids, batch)})
+            await db.commit()
+            bench.products.extend((product_id, p.price) for product_id, p in zip(ids, batch))
+
+        bench.users = [f"bench-{bench.run_id}-user-{n}" for n in range(users)]
+        await db.execute(insert(User), [{"id": uid, "email": f"{uid}@bench.local", "name": uid} for uid in bench.users])
+        await db.execute(insert(Cart), [
+            {"user_id": uid, "product_id": product_id, "quantity": 1}
+            for uid in bench.users
+            for product_id, _ in rng.sample(bench.products, 3)
+        ])
+        await db.commit()
+
+
+def summarize(bench: Bench, elapsed: dict) -> dict:
+    results = {}
+    for name, samples in bench.samples.items():
+        scenario = name.split(" | ")[0]
+        latencies = [seconds for seconds, _ in samples]
+        results[name] = {
+            "requests": len(samples),
+            "rps": len(samples) / elapsed[scenario] if elapsed.get(scenario) else 0.0,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "queries": sum(statements for _, statements in samples) / len(samples),
+            "errors": bench.errors.get(name, 0),
+        }
+    return results
+
+
+def print_report(results: dict, baseline: dict = None):
+    header = f"{'request':<52} {'n':>6} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'q/req':>6} {'err':>4}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        print(f"{name:<52} {r['requests']:>6} {r['rps']:>8.1f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} "
+              f"{r['p99_ms']:>8.2f} {r['queries']:>6.1f} {r['errors']:>4}")
+        before = (baseline or {}).get(name)
+        if before:
+            def delta(key):
+                return f"{(r[key] - before[key]) / before[key] * 100:+.0f}%" if before[key] else "n/a"
+            print(f"{'  vs baseline':<52} {'':>6} {delta('rps'):>8} {delta('p50_ms'):>8} {delta('p95_ms'):>8} "
+                  f"{delta('p99_ms'):>8} {r['queries'] - before['queries']:>+6.1f}")
+
+
+async def run(args):
+    import httpx
+    import stripe
+    from sqlalchemy import event
+    import app.config.firebase_auth as firebase_auth
+    from app.config.database import Base, engine, async_engine
+
+    # The app's own startup would reach out to Firebase; the fake verifier needs none of it
+    firebase_auth.initialize_firebase = lambda: None
+    firebase_auth.token_verifier = FakeTokenVerifier()
+    import main
+    from app.services.webhook_service import webhook_workers
+
+    Base.metadata.create_all(bind=engine)
+
+    @event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements = request_statements.get()
+        if statements is not None:
+            statements[0] += 1
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        bench = Bench(client, args, run_id=f"{int(time.time()):x}")
+        stripe.checkout.Session.create = bench.stripe.create_session
+
+        started = time.perf_counter()
+        await seed(bench, args.products, args.users)
+        print(f"Seeded {args.products} products and {args.users} users with carts "
+              f"in {time.perf_counter() - started:.1f}s ({os.environ['DATABASE_URL'].split('://')[0]})")
+
+        webhook_workers.start()
+        elapsed = {}
+        try:
+            for scenario in args.scenarios:
+                # Record under "scenario | request" so the same route is reported per scenario
+                bench.samples, all_samples = defaultdict(list), bench.samples
+                bench.errors, all_errors = defaultdict(int), bench.errors
+                if scenario == "webhook-burst":
+                    delivered, fulfilled = await bench.webhook_burst(args.burst, args.concurrency)
+                    elapsed[scenario] = delivered
+                    print(f"webhook-burst: {args.burst} events delivered in {delivered:.2f}s, "
+                          f"all fulfilled after {fulfilled:.2f}s ({args.burst / fulfilled:.0f} checkouts/s)")
+                else:
+                    scenario_fn = getattr(bench, scenario.replace("-", "_"))
+                    elapsed[scenario] = await bench.run_for(scenario_fn, args.duration, args.concurrency)
+                for name, samples in bench.samples.items():
+                    all_samples[f"{scenario} | {name}"] = samples
+                for name, count in bench.errors.items():
+                    all_errors[f"{scenario} | {name}"] = count
+                bench.samples, bench.errors = all_samples, all_errors
+        finally:
+            await webhook_workers.stop()
+
+    results = summarize(bench, elapsed)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print()
+    print_report(results, baseline)
+    for name, error in bench.first_errors.items():
+        print(f"first error in {name}: {error}", file=sys.stderr)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved to {args.save}")
+
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Defaults to DATABASE_URL, else a throwaway SQLite file")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per timed scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="Virtual users running at once")
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--burst", type=int, default=500, help="Webhooks delivered in the webhook-burst scenario")
+    parser.add_argument("--stripe-latency-ms", type=float, default=150.0, help="Simulated Stripe API latency")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed, for repeatable request mixes")
+    parser.add_argument("--save", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Show changes against results saved by an earlier --save")
+    args = parser.parse_args()
+    configure_environment(args)
+    asyncio.run(run(args))
@@ -0,0 +1,95 @@
+"""
+Product listing latency with and without in_stock=true, by the share of the catalog in stock.
+
+Seeds --products products with INVENTORY_SHARDS stock shards each, a --in-stock share of
+them with stock left, then times the first page and a page --depth pages in, both through
+ProductService.get_all_products as the catalog cache calls it. Seeded products are removed
+afterwards.
+
+Needs Postgres (the seeding uses generate_series):
+
+    DATABASE_URL=postgresql://... python -m benchmarks.in_stock_listing --products 100000 --in-stock 0.9 0.5 0.05
+"""
+import time
+import asyncio
+import argparse
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+import app.models  # noqa: F401
+from app.config.database import ASYNC_DATABASE_URL, Base, engine
+from app.services.inventory_service import INVENTORY_SHARDS
+from app.services.product_service import ProductService, PRODUCT_OUT_COLUMNS
+
+SEED_NAME = "Listing benchmark product"
+
+
+async def seed(db, products: int, in_stock: float):
+    await db.execute(text(
+        "INSERT INTO products (name, price, created_at) "
+        "SELECT :name, 1 + n % 100, now() - n * interval '1 second' FROM generate_series(1, :products) AS n"
+    ), {"name": SEED_NAME, "products": products})
+    # Sold-out products keep their shard rows at zero, as they are after checkouts drain them
+    await db.execute(text(
+        "INSERT INTO product_stock_shards (product_id, shard, stock) "
+        "SELECT p.id, s, CASE WHEN abs(hashtext(p.id::text)) % 1000 < :cutoff THEN 3 ELSE 0 END "
+        "FROM products p, generate_series(0, :shards - 1) AS s WHERE p.name = :name"
+    ), {"name": SEED_NAME, "shards": INVENTORY_SHARDS, "cutoff": int(in_stock * 1000)})
+    await db.commit()
+    await db.execute(text("ANALYZE products"))
+    await db.execute(text("ANALYZE product_stock_shards"))
+
+
+async def remove_seeded(db):
+    await db.execute(text(
+        "DELETE FROM product_stock_shards WHERE product_id IN (SELECT id FROM products WHERE name = :name)"
+    ), {"name": SEED_NAME})
+    await db.execute(text("DELETE FROM products WHERE name = :name"), {"name": SEED_NAME})
+    await db.commit()
+
+
+async def time_page(db, in_stock: bool, depth: int, repeats: int) -> tuple:
+    """Median milliseconds of the first page and of page `depth`"""
+    cursor = None
+    for _ in range(depth):
+        _, cursor = await ProductService.get_all_products(db, 50, cursor, in_stock=in_stock, columns=PRODUCT_OUT_COLUMNS)
+
+    medians = []
+    for page_cursor in (None, cursor):
+        samples = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            await ProductService.get_all_products(db, 50, page_cursor, in_stock=in_stock, columns=PRODUCT_OUT_COLUMNS)
+            samples.append((time.perf_counter() - started) * 1000)
+            await db.rollback()
+        medians.append(sorted(samples)[len(samples) // 2])
+    return tuple(medians)
+
+
+async def main(args):
+    Base.metadata.create_all(bind=engine)
+    bench_engine = create_async_engine(ASYNC_DATABASE_URL)
+    sessions = async_sessionmaker(bind=bench_engine, expire_on_commit=False)
+
+    try:
+        print(f"{'in stock':>8} {'filter':>8} {'page 1 ms':>10} {f'page {args.depth + 1} ms':>11}")
+        for share in args.in_stock:
+            async with sessions() as db:
+                await remove_seeded(db)
+                await seed(db, args.products, share)
+                for in_stock in (False, True):
+                    first, deep = await time_page(db, in_stock, args.depth, args.repeats)
+                    label = "in_stock" if in_stock else "none"
+                    print(f"{share:>8.0%} {label:>8} {first:>10.2f} {deep:>11.2f}")
+    finally:
+        async with sessions() as db:
+            await remove_seeded(db)
+        await bench_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--in-stock", type=float, nargs="+", default=[0.9, 0.5, 0.05], help="Shares of products in stock")
+    parser.add_argument("--depth", type=int, default=20, help="Pages to follow before timing the deep page")
+    parser.add_argument("--repeats", type=int, default=21, help="Timed runs per page")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,79 @@
+"""
+Checkout throughput on a single hot product, by worker count and stock shard count.
+
+Each worker repeatedly runs a fulfilment-shaped transaction: take one unit of the same
+product through InventoryService.decrement, hold the row lock for --hold-ms (standing in
+for the order inserts that follow in a real checkout), then commit. With one shard every
+worker queues on the same row, so throughput stays flat as workers are added; with N
+shards it should scale until workers outnumber shards.
+
+Needs Postgres (SQLite serializes all writers, which hides the effect):
+
+    DATABASE_URL=postgresql://... python -m benchmarks.inventory_contention --workers 1 2 4 8 16 --shards 1 8
+"""
+import time
+import asyncio
+import argparse
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+import app.models  # noqa: F401
+from app.config.database import ASYNC_DATABASE_URL, Base, engine
+from app.models.product import Product
+from app.models.inventory import StockShard
+from app.services.inventory_service import InventoryService
+
+
+async def run_case(sessions, product_id: int, workers: int, shards: int, duration: float, hold: float) -> float:
+    async with sessions() as db:
+        await InventoryService.set_stock(db, product_id, 10 ** 9, shards=shards)
+        await db.commit()
+
+    deadline = time.perf_counter() + duration
+    completed = 0
+
+    async def worker():
+        nonlocal completed
+        async with sessions() as db:
+            while time.perf_counter() < deadline:
+                await InventoryService.decrement(db, {product_id: 1})
+                await asyncio.sleep(hold)
+                await db.commit()
+                completed += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    return completed / (time.perf_counter() - started)
+
+
+async def main(args):
+    Base.metadata.create_all(bind=engine)
+    bench_engine = create_async_engine(ASYNC_DATABASE_URL, pool_size=max(args.workers), max_overflow=0)
+    sessions = async_sessionmaker(bind=bench_engine, expire_on_commit=False)
+
+    async with sessions() as db:
+        product = Product(name="Benchmark hot product", price=1.0)
+        db.add(product)
+        await db.commit()
+        product_id = product.id
+
+    try:
+        print(f"{'shards':>6} {'workers':>7} {'tx/s':>10}")
+        for shards in args.shards:
+            for workers in args.workers:
+                rate = await run_case(sessions, product_id, workers, shards, args.duration, args.hold_ms / 1000)
+                print(f"{shards:>6} {workers:>7} {rate:>10.1f}")
+    finally:
+        async with sessions() as db:
+            await db.execute(delete(StockShard).filter(StockShard.product_id == product_id))
+            await db.execute(delete(Product).filter(Product.id == product_id))
+            await db.commit()
+        await bench_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per case")
+    parser.add_argument("--hold-ms", type=float, default=5.0, help="Time each transaction holds its stock row lock")
+    asyncio.run(main(parser.parse_args()))
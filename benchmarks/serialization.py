@@ -0,0 +1,161 @@
+"""
+CPU cost of serializing one large list response, by serializer.
+
+Builds --items products, orders (with --order-items items each) and cart rows in memory,
+shaped like what the services return, and times turning each list into the response body:
+
+    response_model   validate each object against the schema (from_attributes), dump with pydantic;
+                     what FastAPI does for a route with a response_model
+    stdlib json      same validation, then json.dumps; what a custom response class used to cost
+    row serializer   app.core.serialization.RowSerializer: no validation, dumped with orjson
+    from row tuples  the same, from rows of the schema's columns instead of ORM objects
+                     (how the catalog reads product pages)
+
+Reported numbers are CPU milliseconds per response (process time, so other load on the
+machine doesn't count), median over --repeats runs. Every serializer's output is checked
+to decode to the same JSON before anything is timed.
+
+    python -m benchmarks.serialization
+    python -m benchmarks.serialization --items 1000 --repeats 50
+"""
+import json
+import time
+import random
+import argparse
+import statistics
+from datetime import datetime, timedelta
+from typing import List
+from pydantic import TypeAdapter
+import app.models  # noqa: F401
+from app.models.product import Product
+from app.models.order import Order
+from app.models.order_item import OrderItem
+from app.schemas.product import ProductOut
+from app.schemas.order import OrderOut, OrderItemOut
+from app.schemas.cart import CartItemOut
+from app.core.serialization import RowSerializer
+from app.api.v1.cart import to_cart_item_out
+
+WORDS = ["rose", "matte", "velvet", "glow", "hydrating", "organic", "shea", "argan", "silk", "amber"]
+
+
+def make_products(count: int):
+    created = datetime(2026, 1, 1)
+    return [
+        Product(
+            id=i, name=f"{random.choice(WORDS).title()} {random.choice(WORDS)} {i}", sku=f"SKU-{i:06d}",
+            description=" ".join(random.choices(WORDS, k=12)), price=round(random.uniform(2, 80), 2),
+            stock=random.randint(0, 500), image_url=f"https://cdn.example.com/p/{i}.jpg",
+            category=random.choice(WORDS), created_at=created + timedelta(seconds=i)
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def make_orders(count: int, items_per_order: int):
+    created = datetime(2026, 1, 1)
+    orders = []
+    for i in range(1, count + 1):
+        items = [
+            OrderItem(id=i * 100 + n, product_id=random.randint(1, 5000), quantity=random.randint(1, 3),
+                      price=round(random.uniform(2, 80), 2))
+            for n in range(items_per_order)
+        ]
+        total = round(sum(item.price * item.quantity for item in items), 2)
+        orders.append(Order(id=i, total_amount=total, status="paid", created_at=created + timedelta(minutes=i),
+                            order_items=items))
+    return orders
+
+
+def make_cart_rows(count: int):
+    # (id, product_id, quantity, name, price, image_url), as CartService.get_cart returns them
+    return [
+        (i, i + 1000, random.randint(1, 5), f"{random.choice(WORDS).title()} {i}",
+         round(random.uniform(2, 80), 2), f"https://cdn.example.com/p/{i}.jpg")
+        for i in range(1, count + 1)
+    ]
+
+
+def validated(adapter: TypeAdapter, prepare=None):
+    def dump(data):
+        models = [prepare(row) for row in data] if prepare else adapter.validate_python(data, from_attributes=True)
+        return adapter.dump_json(models)
+    return dump
+
+
+def validated_stdlib(adapter: TypeAdapter, prepare=None):
+    def dump(data):
+        models = [prepare(row) for row in data] if prepare else adapter.validate_python(data, from_attributes=True)
+        return json.dumps(adapter.dump_python(models, mode="json"), separators=(",", ":")).encode()
+    return dump
+
+
+def cases(args):
+    """(response, {serializer: (dump, data)}) for each list response"""
+    products = make_products(args.items)
+    # The catalog reads pages as rows of PRODUCT_OUT_COLUMNS, in ProductOut's field order
+    product_rows = [tuple(getattr(product, name) for name in ProductOut.model_fields) for product in products]
+    orders = make_orders(args.items, args.order_items)
+    cart_rows = make_cart_rows(args.items)
+
+    product_adapter = TypeAdapter(List[ProductOut])
+    order_adapter = TypeAdapter(List[OrderOut])
+    cart_adapter = TypeAdapter(List[CartItemOut])
+    product_serializer = RowSerializer(ProductOut)
+    order_serializer = RowSerializer(OrderOut, nested={"order_items": RowSerializer(OrderItemOut)})
+
+    return [
+        ("List[ProductOut]", {
+            "response_model": (validated(product_adapter), products),
+            "stdlib json": (validated_stdlib(product_adapter), products),
+            "row serializer": (product_serializer.dump_objects, products),
+            "from row tuples": (product_serializer.dump_rows, product_rows),
+        }),
+        ("List[OrderOut]", {
+            "response_model": (validated(order_adapter), orders),
+            "stdlib json": (validated_stdlib(order_adapter), orders),
+            "row serializer": (order_serializer.dump_objects, orders),
+        }),
+        ("List[CartItemOut]", {
+            "response_model": (validated(cart_adapter, to_cart_item_out), cart_rows),
+            "stdlib json": (validated_stdlib(cart_adapter, to_cart_item_out), cart_rows),
+            "row serializer": (RowSerializer(CartItemOut).dump_rows, cart_rows),
+        }),
+    ]
+
+
+def cpu_ms(dump, data, repeats: int) -> float:
+    dump(data)  # warm up
+    runs = []
+    for _ in range(repeats):
+        start = time.process_time()
+        dump(data)
+        runs.append((time.process_time() - start) * 1000)
+    return statistics.median(runs)
+
+
+def main(args):
+    random.seed(args.seed)
+    print(f"{args.items} items per response, CPU ms per response (median of {args.repeats})\n")
+    print(f"{'response':<20} {'serializer':<16} {'cpu ms':>8} {'KiB':>8} {'vs response_model':>18}")
+    for label, serializers in cases(args):
+        bodies = {name: dump(data) for name, (dump, data) in serializers.items()}
+        expected = json.loads(bodies["response_model"])
+        for name, body in bodies.items():
+            if json.loads(body) != expected:
+                raise SystemExit(f"{label}: {name} output differs from the response_model output")
+
+        baseline = None
+        for name, (dump, data) in serializers.items():
+            ms = cpu_ms(dump, data, args.repeats)
+            baseline = baseline or ms
+            print(f"{label:<20} {name:<16} {ms:>8.2f} {len(bodies[name]) / 1024:>8.1f} {baseline / ms:>17.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=1000, help="Items per list response")
+    parser.add_argument("--order-items", type=int, default=3, help="Items per order")
+    parser.add_argument("--repeats", type=int, default=30, help="Timed runs per serializer")
+    parser.add_argument("--seed", type=int, default=1)
+    main(parser.parse_args())
@@ -0,0 +1,112 @@
+"""
+Worker boot time: importing main.py and running the app's startup, each in a fresh interpreter.
+
+Autoscaling and crash recovery both wait on this, so it has a budget. The run fails
+(exit status 1) when the median boot exceeds --budget-ms, or when importing main.py
+pulls in an SDK that is meant to load lazily on first use.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --runs 10 --budget-ms 1500 --top 15
+
+Runs offline: Firebase signing keys come from an empty local key set, the webhook
+workers are disabled, and the database is a throwaway SQLite file unless DATABASE_URL is set.
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+# Modules main.py must not import at boot; each costs tens to hundreds of milliseconds
+LAZY_MODULES = ("stripe", "google.auth.jwt")
+
+BOOT_SCRIPT = """
+import sys, json, time, asyncio
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+eager = [name for name in {lazy!r} if name in sys.modules]
+
+async def boot():
+    async with main.app.router.lifespan_context(main.app):
+        return time.perf_counter()
+
+ready = asyncio.run(boot())
+print(json.dumps({{"import": imported - started, "startup": ready - imported, "eager": eager}}))
+"""
+
+
+def boot_environment(workdir: str) -> dict:
+    keyset = os.path.join(workdir, "keyset.json")
+    with open(keyset, "w") as f:
+        f.write("{}")
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'boot.sqlite')}")
+    env.setdefault("FIREBASE_JSON", json.dumps({"type": "service_account", "project_id": "boot-benchmark"}))
+    env["FIREBASE_KEYSET_FILE"] = keyset
+    env["WEBHOOK_WORKERS"] = "0"
+    return env
+
+
+def boot_once(env: dict) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", BOOT_SCRIPT.format(lazy=LAZY_MODULES)],
+        env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(env: dict, top: int):
+    """The slowest modules by cumulative import time, from python -X importtime"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        env=env, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Only modules imported directly by main.py or the app, so nested imports aren't counted twice
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth <= 1 or name.strip().startswith("app."):
+            rows.append((int(cumulative) / 1000, name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main(args):
+    with tempfile.TemporaryDirectory(prefix="elavid-boot-") as workdir:
+        env = boot_environment(workdir)
+        runs = [boot_once(env) for _ in range(args.runs)]
+
+        imports = [run["import"] * 1000 for run in runs]
+        startups = [run["startup"] * 1000 for run in runs]
+        totals = [i + s for i, s in zip(imports, startups)]
+        print(f"{'':<10} {'median ms':>10} {'min ms':>8} {'max ms':>8}")
+        for label, values in (("import", imports), ("startup", startups), ("total", totals)):
+            print(f"{label:<10} {statistics.median(values):>10.1f} {min(values):>8.1f} {max(values):>8.1f}")
+
+        if args.top:
+            print(f"\nSlowest imports under main.py:")
+            for ms, name in slowest_imports(env, args.top):
+                print(f"  {ms:>8.1f} ms  {name}")
+
+    failures = []
+    eager = sorted({name for run in runs for name in run["eager"]})
+    if eager:
+        failures.append(f"main.py imports {', '.join(eager)} at boot; they should load on first use")
+    if statistics.median(totals) > args.budget_ms:
+        failures.append(f"median boot {statistics.median(totals):.0f} ms is over the {args.budget_ms:.0f} ms budget")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to boot")
+    parser.add_argument("--budget-ms", type=float, default=1500.0, help="Largest acceptable median import + startup")
+    parser.add_argument("--top", type=int, default=10, help="Show this many of the slowest imports (0 to skip)")
+    sys.exit(main(parser.parse_args()))
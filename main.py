@@ -1,37 +1,94 @@
 import os
+import secrets
+from contextlib import asynccontextmanager
 try:
     from dotenv import load_dotenv
     load_dotenv()
 except ImportError:
     pass
 
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.config.firebase_auth import initialize_firebase
-from app.config.database import engine, Base
+from app.config.firebase_auth import initialize_firebase, token_cache
+from app.config.database import async_engine, replica_engine, pool_stats, pool_gauges
+from app.core import metrics
+from app.core.compression import CompressionMiddleware
+from app.core.query_budget import QueryBudgetMiddleware, instrument_engine as count_engine_queries
+from app.core.read_your_writes import ReadYourWritesMiddleware
 import app.models  # noqa: F401
-from app.api.v1 import users, products, cart, orders, payments
+from app.api.v1 import users, products, cart, orders, payments, sales
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.services.webhook_service import webhook_workers
+from app.services.catalog_cache import catalog_cache
 
-app = FastAPI(title="Elavid API")
 
-initialize_firebase()
-Base.metadata.create_all(bind=engine)
+# Boot stays cheap: no schema DDL (run `python -m app.cli create-schema` when deploying), no network
+# round trips before serving, and the Stripe SDK is only imported when a payment route first needs it
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    initialize_firebase()
+    # Background workers draining the Stripe webhook inbox (WEBHOOK_WORKERS=0 disables them)
+    webhook_workers.start()
+    yield
+    await webhook_workers.stop()
+
+
+app = FastAPI(title="Elavid API", lifespan=lifespan)
 
 app.include_router(users.router, prefix="/api/v1")
 app.include_router(products.router, prefix="/api/v1")
 app.include_router(cart.router, prefix="/api/v1")
 app.include_router(orders.router, prefix="/api/v1")
 app.include_router(payments.router, prefix="/api/v1")
+app.include_router(sales.router, prefix="/api/v1")
 
 cors_origins = os.getenv("CORS_ORIGINS", "http://localhost:5173")
 origins = [o.strip() for o in cors_origins.split(",")]
 
+# Bearer token for the operational endpoints (/metrics, /health/db); unset, they are not served
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
+)
+# gzip/brotli per Accept-Encoding; cached catalog responses arrive already compressed and pass through
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(QueryBudgetMiddleware)
+# Pins a user's reads to the primary on every worker for a while after their writes
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
+
+for async_db in (async_engine, replica_engine):
+    if async_db is not None:
+        metrics.instrument_engine(async_db)
+        count_engine_queries(async_db)
+
+
+def collect_pool_stats():
+    engines = [("primary", async_engine)] + ([("replica", replica_engine)] if replica_engine is not None else [])
+    for name, async_db in engines:
+        for stat, value in pool_gauges(async_db.pool).items():
+            if stat != "pool":
+                yield (name, stat), value
+
+
+def collect_cache_stats():
+    for name, cache in (("catalog", catalog_cache), ("token", token_cache)):
+        stats = cache.stats()
+        for stat in ("size", "hits", "misses"):
+            yield (name, stat), stats[stat]
+
+
+metrics.CallbackGauge(
+    "db_pool", "Connection pool gauges and checkout wait totals", ("engine", "stat"), collect_pool_stats
+)
+metrics.CallbackGauge(
+    "cache_stats", "In-process cache size, hits and misses", ("cache", "stat"), collect_cache_stats
 )
 
 
@@ -39,3 +96,24 @@ app.add_middleware(
 def root():
     """Health check endpoint - just confirms the API is running"""
     return {"message": "Elavid API is running"}
+
+
+def require_metrics_token(request: Request):
+    """Only the scraper holding METRICS_TOKEN may read worker internals"""
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.encode(), METRICS_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token", headers={"WWW-Authenticate": "Bearer"})
+
+
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(require_metrics_token)])
+def prometheus_metrics():
+    """Metrics of this worker process in the Prometheus text format"""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/health/db", include_in_schema=False, dependencies=[Depends(require_metrics_token)])
+def database_pool():
+    """Connection pool gauges (checked out, overflow, checkout wait times) for sizing workers"""
+    return pool_stats()
@@ -0,0 +1,106 @@
+"""
+Tests run the app in-process over httpx's ASGI transport against a throwaway SQLite database,
+with QUERY_BUDGET_MODE=raise so any request over its route's statement budget fails.
+
+A bearer token is the Firebase UID itself; "admin" is the one admin.
+"""
+import os
+import json
+import asyncio
+import tempfile
+
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='elavid-tests-')}/test.sqlite"
+os.environ["QUERY_BUDGET_MODE"] = "raise"
+os.environ["ADMIN_UIDS"] = "admin"
+os.environ["WEBHOOK_WORKERS"] = "0"
+os.environ["STRIPE_WEBHOOK_SECRET"] = "whsec_test"
+os.environ["STRIPE_SECRET_KEY"] = "sk_test"
+os.environ.setdefault("FIREBASE_JSON", json.dumps({"type": "service_account", "project_id": "elavid-test"}))
+os.environ.pop("DATABASE_REPLICA_URL", None)
+os.environ.pop("ASYNC_DATABASE_URL", None)
+
+import httpx
+import pytest
+from sqlalchemy import MetaData, Table, Column, Integer, String, Float, DateTime, ForeignKey, create_engine, func
+
+import main
+from app.config import firebase_auth
+from app.config.database import Base, async_engine, AsyncSessionLocal
+
+
+class FakeTokenVerifier:
+    async def verify_async(self, token: str) -> dict:
+        return {"uid": token, "sub": token, "email": f"{token}@test.local", "name": token}
+
+
+firebase_auth.token_verifier = FakeTokenVerifier()
+
+
+@pytest.fixture(scope="session")
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.run_until_complete(async_engine.dispose())
+    loop.close()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema(loop):
+    async def create():
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    loop.run_until_complete(create())
+
+
+@pytest.fixture
+def run(loop):
+    """Run a coroutine to completion on the session's event loop"""
+    return loop.run_until_complete
+
+
+@pytest.fixture
+def client(loop):
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test")
+    yield client
+    loop.run_until_complete(client.aclose())
+
+
+@pytest.fixture
+def db(loop):
+    session = AsyncSessionLocal()
+    yield session
+    loop.run_until_complete(session.close())
+
+
+def baseline_metadata():
+    """The users, products and cart tables as the first release created them"""
+    metadata = MetaData()
+    Table("users", metadata, Column("id", String, primary_key=True), Column("email", String), Column("name", String))
+    Table(
+        "products", metadata,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("name", String, nullable=False),
+        Column("description", String),
+        Column("price", Float, nullable=False),
+        Column("stock", Integer, default=0),
+        Column("image_url", String),
+        Column("category", String),
+        Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    )
+    Table(
+        "cart", metadata,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("user_id", String, ForeignKey("users.id"), nullable=False),
+        Column("product_id", Integer, ForeignKey("products.id"), nullable=False),
+        Column("quantity", Integer, default=1),
+    )
+    return metadata
+
+
+@pytest.fixture
+def baseline_engine(tmp_path):
+    """Sync engine on a separate SQLite database holding the first release's tables, before any migration"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'baseline.sqlite'}")
+    baseline_metadata().create_all(engine)
+    yield engine
+    engine.dispose()
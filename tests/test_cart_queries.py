@@ -0,0 +1,64 @@
+from app.core.query_budget import track_queries
+from app.models.cart import Cart
+from app.models.product import Product
+from app.models.user import User
+from app.services.cart_service import CartService
+
+
+def test_get_cart_is_one_query_whatever_its_size(run, db):
+    async def seed_cart(user_id: str, items: int):
+        products = [
+            Product(name=f"{user_id} item {i}", price=5 + i, image_url=f"https://img.test/{i}.png")
+            for i in range(items)
+        ]
+        db.add(User(id=user_id, email=f"{user_id}@test.local", name=user_id))
+        db.add_all(products)
+        await db.flush()
+        db.add_all(Cart(user_id=user_id, product_id=product.id, quantity=i + 1) for i, product in enumerate(products))
+        await db.commit()
+        return products
+
+    async def scenario():
+        for user_id, items in (("cart-of-1", 1), ("cart-of-30", 30)):
+            products = await seed_cart(user_id, items)
+            db.expunge_all()
+
+            with track_queries() as log:
+                rows = await CartService.get_cart(db, user_id)
+
+            assert log.total == 1
+            assert [(row.product_id, row.quantity, row.name, row.price, row.image_url) for row in rows] == [
+                (product.id, i + 1, product.name, product.price, product.image_url)
+                for i, product in enumerate(products)
+            ]
+
+    run(scenario())
+
+
+def test_cart_writes_reject_quantities_out_of_range(run, client, db):
+    user = {"Authorization": "Bearer cart-bounds"}
+
+    async def scenario():
+        product = Product(name="Bounded tint", price=3)
+        db.add(product)
+        await db.commit()
+        await client.post("/api/v1/users/me", headers=user)
+
+        for operation in ({"op": "add", "quantity": -5}, {"op": "add", "quantity": 0}, {"op": "set", "quantity": -1}):
+            response = await client.post("/api/v1/cart/batch", headers=user, json={"operations": [
+                {"op": "add", "product_id": product.id, "quantity": 2},
+                {**operation, "product_id": product.id},
+            ]})
+            assert response.status_code == 422, operation
+        response = await client.post("/api/v1/cart/add", headers=user, json={"product_id": product.id, "quantity": -5})
+        assert response.status_code == 422
+        assert await CartService.get_cart(db, "cart-bounds") == []
+
+        response = await client.post("/api/v1/cart/batch", headers=user, json={"operations": [
+            {"op": "add", "product_id": product.id, "quantity": 2},
+            {"op": "set", "product_id": product.id, "quantity": 0},
+        ]})
+        assert response.status_code == 200
+        assert response.json() == []
+
+    run(scenario())
@@ -0,0 +1,49 @@
+from app.core.query_budget import track_queries
+from app.models.product import Product
+from app.services.catalog_cache import CatalogCache
+
+
+def test_writes_published_by_one_worker_reach_the_others(run, db):
+    # Two worker processes, each with its own cache, sharing the database
+    writer, reader = CatalogCache(check_interval=0), CatalogCache(check_interval=60)
+
+    async def scenario():
+        product = Product(name="Shared cedar candle", price=12)
+        db.add(product)
+        await db.commit()
+        await writer.publish(db)
+        db.expunge_all()
+
+        assert b"cedar" in (await reader.get_product(db, product.id)).body
+        with track_queries() as log:
+            await reader.get_product(db, product.id)
+        assert log.total == 0
+
+        db.add(product)
+        product.name = "Shared fig candle"
+        await db.commit()
+        await writer.publish(db)
+        db.expunge_all()
+
+        # Within its check interval the reader still serves what it cached
+        assert b"cedar" in (await reader.get_product(db, product.id)).body
+
+        reader.checked_at -= 60
+        text_version = reader.text_version
+        assert b"fig" in (await reader.get_product(db, product.id)).body
+        assert reader.text_version == text_version + 1
+
+        # Stock-only writes drop entries but leave text_version alone
+        await writer.publish(db, stock_only=True)
+        reader.checked_at -= 60
+        version = reader.version
+        await reader.get_product(db, product.id)
+        assert (reader.version, reader.text_version) == (version + 1, text_version + 1)
+
+        # The writer doesn't drop its entries a second time for its own bump
+        await writer.get_product(db, product.id)
+        with track_queries() as log:
+            await writer.get_product(db, product.id)
+        assert log.total == 1
+
+    run(scenario())
@@ -0,0 +1,89 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from app.config.database import Base
+from app.config.migrations import migrate
+from app.core.query_budget import track_queries
+from app.models.inventory import StockShard
+from app.models.product import Product
+from app.services.inventory_service import InventoryService
+
+
+async def add_product(db, stock: int, shards: int) -> int:
+    product = Product(name="Inventory lotion", price=4)
+    db.add(product)
+    await db.flush()
+    await InventoryService.set_stock(db, product.id, stock, shards=shards)
+    await db.commit()
+    return product.id
+
+
+async def shard_stocks(db, product_id: int) -> list:
+    result = await db.execute(select(StockShard.stock).filter(StockShard.product_id == product_id).order_by(StockShard.shard))
+    return result.scalars().all()
+
+
+def test_fast_path_takes_the_whole_quantity_from_one_shard(run, db):
+    async def scenario():
+        product_id = await add_product(db, 80, shards=8)
+        with track_queries() as log:
+            assert await InventoryService.decrement(db, {product_id: 3}) == []
+        await db.commit()
+        assert log.total == 1
+        assert sorted(await shard_stocks(db, product_id)) == [7] + [10] * 7
+
+    run(scenario())
+
+
+def test_slow_path_drains_across_shards_when_none_has_enough(run, db):
+    async def scenario():
+        product_id = await add_product(db, 8, shards=8)
+        assert await InventoryService.decrement(db, {product_id: 5}) == []
+        await db.commit()
+        assert await shard_stocks(db, product_id) == [0] * 5 + [1] * 3
+
+    run(scenario())
+
+
+def test_decrement_returns_the_oversold_products_and_drains_them(run, db):
+    async def scenario():
+        scarce = await add_product(db, 2, shards=8)
+        plenty = await add_product(db, 16, shards=8)
+        assert await InventoryService.decrement(db, {scarce: 5, plenty: 1}) == [scarce]
+        await db.commit()
+        assert await shard_stocks(db, scarce) == [0] * 8
+        assert sum(await shard_stocks(db, plenty)) == 15
+
+        # A multi-product order the fast path covers keeps what it took
+        assert await InventoryService.decrement(db, {plenty: 2, scarce: 0}) == []
+        await db.commit()
+        assert sum(await shard_stocks(db, plenty)) == 13
+
+    run(scenario())
+
+
+def test_backfill_moves_legacy_stock_once(run, baseline_engine):
+    with baseline_engine.begin() as conn:
+        conn.execute(Product.__table__.insert(), [
+            {"id": 1, "name": "Legacy toner", "price": 6},
+            {"id": 2, "name": "Legacy mist", "price": 7},
+        ])
+        conn.exec_driver_sql("UPDATE products SET stock = id * 10")
+        Base.metadata.create_all(conn)
+        migrate(conn)
+
+    engine = create_async_engine(baseline_engine.url.set(drivername="sqlite+aiosqlite"))
+    sessions = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    async def scenario():
+        async with sessions() as db:
+            assert await InventoryService.backfill_legacy_stock(db) == 2
+            assert [sum(await shard_stocks(db, product_id)) for product_id in (1, 2)] == [10, 20]
+            await InventoryService.decrement(db, {1: 4})
+            await db.commit()
+
+            # Deploys run it every time: products that already have shards keep their (since changed) stock
+            assert await InventoryService.backfill_legacy_stock(db) == 0
+            assert [sum(await shard_stocks(db, product_id)) for product_id in (1, 2)] == [6, 20]
+        await engine.dispose()
+
+    run(scenario())
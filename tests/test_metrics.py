@@ -0,0 +1,32 @@
+import pytest
+
+import main
+from app.core import metrics
+
+
+def test_operational_endpoints_need_the_metrics_token(run, client, monkeypatch):
+    async def statuses(headers):
+        return [(await client.get(path, headers=headers)).status_code for path in ("/metrics", "/health/db")]
+
+    monkeypatch.setattr(main, "METRICS_TOKEN", "")
+    assert run(statuses({"Authorization": "Bearer anything"})) == [404, 404]
+
+    monkeypatch.setattr(main, "METRICS_TOKEN", "scrape-secret")
+    assert run(statuses({})) == [401, 401]
+    assert run(statuses({"Authorization": "Bearer wrong"})) == [401, 401]
+    assert run(statuses({"Authorization": "Basic scrape-secret"})) == [401, 401]
+    assert run(statuses({"Authorization": "Bearer scrape-secret"})) == [200, 200]
+
+    response = run(client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"}))
+    assert response.headers["content-type"] == metrics.CONTENT_TYPE
+    assert "# TYPE http_request_duration_seconds histogram" in response.text
+
+
+def test_metric_subclasses_must_define_samples():
+    class Incomplete(metrics.Metric):
+        kind = "gauge"
+
+    registered = len(metrics.REGISTRY)
+    with pytest.raises(TypeError):
+        Incomplete("incomplete", "Never exposed")
+    assert len(metrics.REGISTRY) == registered
@@ -0,0 +1,39 @@
+from sqlalchemy import inspect, select
+from sqlalchemy.dialects import sqlite
+from app.config.database import Base
+from app.config.migrations import migrate
+from app.models.cart import Cart
+from app.models.product import Product
+
+
+def test_create_schema_upgrades_a_baseline_database(baseline_engine):
+    engine = baseline_engine
+    with engine.begin() as conn:
+        conn.execute(Product.__table__.insert().values(id=1, name="Old serum", price=10))
+        conn.execute(Cart.__table__.insert(), [
+            {"user_id": "u1", "product_id": 1, "quantity": 2},
+            {"user_id": "u1", "product_id": 1, "quantity": 3},
+        ])
+
+    # What `python -m app.cli create-schema` runs
+    with engine.begin() as conn:
+        Base.metadata.create_all(conn)
+        applied = migrate(conn)
+    assert applied[:2] == ["add_cart_unique_constraint", "add_product_sku"]
+
+    with engine.begin() as conn:
+        assert migrate(conn) == []
+
+        inspector = inspect(conn)
+        assert ["sku"] in [i["column_names"] for i in inspector.get_indexes("products") if i["unique"]]
+        assert conn.execute(select(Cart.quantity)).scalars().all() == [5]
+
+        # Product reads work, and imports can upsert on the SKU
+        assert conn.execute(select(Product.name, Product.sku, Product.stock)).all() == [("Old serum", None, 0)]
+        upsert = sqlite.insert(Product.__table__)
+        for price in (7, 8):
+            conn.execute(
+                upsert.values(name="Imported mask", sku="MASK-1", price=price)
+                .on_conflict_do_update(index_elements=[Product.sku], set_={"price": upsert.excluded.price})
+            )
+        assert conn.execute(select(Product.price).filter(Product.sku == "MASK-1")).scalars().all() == [8]
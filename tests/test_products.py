@@ -0,0 +1,18 @@
+ADMIN = {"Authorization": "Bearer admin"}
+
+
+def test_a_sku_already_in_use_is_a_conflict(run, client):
+    async def scenario():
+        first = await client.post("/api/v1/products/", headers=ADMIN, json={"name": "Clay mask", "sku": "DUP-1", "price": 9})
+        second = await client.post("/api/v1/products/", headers=ADMIN, json={"name": "Mud mask", "sku": "DUP-2", "price": 9})
+        assert (first.status_code, second.status_code) == (200, 200)
+
+        taken = await client.post("/api/v1/products/", headers=ADMIN, json={"name": "Copy", "sku": "DUP-1", "price": 1})
+        assert taken.status_code == 409
+
+        moved = await client.put(f"/api/v1/products/{second.json()['id']}", headers=ADMIN, json={"sku": "DUP-1"})
+        assert moved.status_code == 409
+        kept = await client.get(f"/api/v1/products/{second.json()['id']}")
+        assert kept.json()["sku"] == "DUP-2"
+
+    run(scenario())
@@ -0,0 +1,92 @@
+"""
+Drives every /api/v1 route once, along its most expensive path, under QUERY_BUDGET_MODE=raise:
+a route running more statements than its @query_budget fails the request with a 500.
+"""
+import json
+import hmac
+import time
+import hashlib
+from types import SimpleNamespace
+
+from app.api.v1 import users, products, cart, orders, payments, sales
+from app.config.stripe_sdk import get_stripe
+from app.services.webhook_service import WebhookService
+
+ROUTERS = (users, products, cart, orders, payments, sales)
+ADMIN = {"Authorization": "Bearer admin"}
+USER = {"Authorization": "Bearer budget-user"}
+
+
+def signed_webhook(session: dict):
+    event = {"id": f"evt_{session['id']}", "type": "checkout.session.completed", "data": {"object": session}}
+    body = json.dumps(event)
+    timestamp = int(time.time())
+    signature = hmac.new(b"whsec_test", f"{timestamp}.{body}".encode(), hashlib.sha256).hexdigest()
+    return body, {"stripe-signature": f"t={timestamp},v1={signature}", "content-type": "application/json"}
+
+
+def test_every_route_stays_within_its_budget(run, client, db, monkeypatch):
+    sessions = []
+
+    def create_session(**params):
+        session = {"id": "cs_budget_1", "url": "https://checkout.stripe.test/1",
+                   "payment_intent": "pi_budget_1", "metadata": params["metadata"]}
+        sessions.append(session)
+        return SimpleNamespace(**session)
+
+    monkeypatch.setattr(get_stripe().checkout.Session, "create", create_session)
+    driven = set()
+
+    async def call(method, route, url=None, expect=200, **kwargs):
+        response = await client.request(method, "/api/v1" + (url or route), **kwargs)
+        assert response.status_code == expect, f"{method} {route}: {response.status_code} {response.text}"
+        driven.add((method, route))
+        return response
+
+    async def scenario():
+        await call("POST", "/users/me", headers=USER)
+        created = []
+        for i in range(3):
+            response = await call("POST", "/products/", headers=ADMIN, json={
+                "name": f"Budget balm {i}", "sku": f"BUDGET-{i}", "price": 10 + i, "stock": 50,
+                "category": "lips", "description": "hydrating shea lip balm",
+            })
+            created.append(response.json()["id"])
+        first, second, doomed = created
+
+        await call("POST", "/products/import", headers={**ADMIN, "content-type": "text/csv"},
+                   content="name,sku,price,stock\nImported balm,BUDGET-IMPORT,12,5\n")
+        await call("PUT", "/products/{product_id}", f"/products/{first}", headers=ADMIN,
+                   json={"name": "Budget balm", "price": 11, "stock": 40})
+        await call("GET", "/products/", "/products/?in_stock=true&category=lips")
+        await call("GET", "/products/search", "/products/search?q=shea")
+        await call("GET", "/products/{product_id}", f"/products/{first}")
+
+        await call("POST", "/cart/add", headers=USER, json={"product_id": doomed, "quantity": 1})
+        await call("POST", "/cart/add", headers=USER, json={"product_id": first, "quantity": 1})
+        await call("PUT", "/cart/update", f"/cart/update?product_id={first}", headers=USER, json={"quantity": 2})
+        await call("DELETE", "/cart/remove", f"/cart/remove?product_id={first}", headers=USER)
+        await call("POST", "/cart/batch", headers=USER, json={"operations": [
+            {"op": "add", "product_id": first, "quantity": 2},
+            {"op": "set", "product_id": second, "quantity": 1},
+            {"op": "remove", "product_id": doomed},
+        ]})
+        await call("GET", "/cart/", headers=USER)
+        await call("DELETE", "/products/{product_id}", f"/products/{doomed}", headers=ADMIN)
+
+        await call("POST", "/payments/checkout", headers=USER)
+        body, headers = signed_webhook(sessions[-1])
+        await call("POST", "/payments/webhook/stripe", content=body, headers=headers)
+        assert await WebhookService.process_next(db)
+
+        response = await call("GET", "/orders/", headers=USER)
+        order_id = response.json()[0]["id"]
+        await call("GET", "/orders/{order_id}", f"/orders/{order_id}", headers=USER)
+        await call("GET", "/orders/export", "/orders/export?format=csv", headers=ADMIN)
+        await call("GET", "/sales/products", headers=ADMIN)
+        await call("GET", "/sales/categories", headers=ADMIN)
+
+    run(scenario())
+
+    routes = {(method, route.path) for module in ROUTERS for route in module.router.routes for method in route.methods}
+    assert routes - driven == set()
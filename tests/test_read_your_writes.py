@@ -0,0 +1,52 @@
+from app.config import database
+from app.config.database import AsyncSessionLocal, recent_writes
+from app.core.read_your_writes import READ_PRIMARY_COOKIE
+from app.models.product import Product
+
+USER = {"Authorization": "Bearer rw-user"}
+
+
+def test_reads_after_a_write_skip_the_replica_on_any_worker(run, client, db, monkeypatch):
+    replica_reads = []
+
+    def replica_session():
+        replica_reads.append(1)
+        return AsyncSessionLocal()
+
+    # A replica that's really the primary, to count which reads were routed to it
+    monkeypatch.setattr(database, "replica_engine", object())
+    monkeypatch.setattr(database, "ReplicaSessionLocal", replica_session)
+
+    async def read_cart(until=None):
+        replica_reads.clear()
+        headers = {**USER, "Cookie": f"{READ_PRIMARY_COOKIE}={until}"} if until else USER
+        response = await client.get("/api/v1/cart/", headers=headers)
+        assert response.status_code == 200
+        return len(replica_reads)
+
+    async def scenario():
+        product = Product(name="Replica rouge", price=8)
+        db.add(product)
+        await db.commit()
+        await client.post("/api/v1/users/me", headers=USER)
+        assert await read_cart() == 1
+
+        response = await client.post("/api/v1/cart/add", headers=USER, json={"product_id": product.id})
+        assert response.status_code == 200
+        cookie = response.headers["set-cookie"]
+        assert cookie.startswith(f"{READ_PRIMARY_COOKIE}=") and "Max-Age=5" in cookie
+        until = response.cookies[READ_PRIMARY_COOKIE]
+
+        # The worker that wrote reads from the primary; so does any other worker shown the cookie
+        assert await read_cart() == 0
+        recent_writes._until.clear()
+        assert await read_cart() == 1
+        assert await read_cart(until) == 0
+
+        # Reads don't set it, and a cookie pinning reads for longer than allowed is ignored
+        response = await client.get("/api/v1/cart/", headers=USER)
+        assert "set-cookie" not in response.headers
+        assert await read_cart("99999999999") == 1
+        assert await read_cart("soon") == 1
+
+    run(scenario())
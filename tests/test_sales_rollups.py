@@ -0,0 +1,51 @@
+import json
+
+from app.models.product import Product
+from app.models.user import User
+from app.services.inventory_service import InventoryService
+from app.services.payment_service import PaymentService
+from app.services.sales_rollup_service import SalesRollupService
+
+ADMIN = {"Authorization": "Bearer admin"}
+
+
+def test_incremental_rollups_match_a_rebuild(run, client, db):
+    async def reports():
+        products = await client.get("/api/v1/sales/products?limit=500", headers=ADMIN)
+        categories = await client.get("/api/v1/sales/categories", headers=ADMIN)
+        assert (products.status_code, categories.status_code) == (200, 200)
+        return products.json(), categories.json()
+
+    async def fulfil(session_id: str, lines: list):
+        snapshot = [{"product_id": product.id, "quantity": quantity, "price": product.price} for product, quantity in lines]
+        await PaymentService.handle_checkout_completed(db, {
+            "id": session_id,
+            "payment_intent": f"pi_{session_id}",
+            "metadata": {"user_id": "rollup-buyer", "cart_snapshot": json.dumps(snapshot)},
+        })
+
+    async def scenario():
+        gloss = Product(name="Rollup gloss", price=12.5, category="lips")
+        liner = Product(name="Rollup liner", price=7, category="lips")
+        mascara = Product(name="Rollup mascara", price=20, category="eyes")
+        sample = Product(name="Rollup sample", price=1.25)
+        db.add(User(id="rollup-buyer", email="rollup-buyer@test.local", name="Rollup buyer"))
+        db.add_all([gloss, liner, mascara, sample])
+        await db.flush()
+        await InventoryService.set_stock_many(db, {product.id: 100 for product in (gloss, liner, mascara, sample)})
+        await db.commit()
+
+        await fulfil("cs_rollup_1", [(gloss, 2), (mascara, 1)])
+        await fulfil("cs_rollup_2", [(gloss, 1), (liner, 3), (sample, 4)])
+
+        products, categories = await reports()
+        totals = {row["product_id"]: (row["units"], row["revenue"], row["orders"]) for row in products}
+        assert [totals[product.id] for product in (gloss, liner, mascara, sample)] == [
+            (3, 37.5, 2), (3, 21.0, 1), (1, 20.0, 1), (4, 5.0, 1)
+        ]
+        assert {"lips", "eyes", None} <= {row["category"] for row in categories}
+
+        await SalesRollupService.rebuild(db)
+        assert await reports() == (products, categories)
+
+    run(scenario())
@@ -0,0 +1,37 @@
+from app.core.query_budget import track_queries
+from app.models.product import Product
+from app.services.catalog_cache import catalog_cache
+from app.services.search_service import InMemorySearchIndex
+
+
+def test_memory_index_rebuilds_on_text_writes_and_ttl_only(run, db):
+    index = InMemorySearchIndex(ttl=60)
+
+    async def statements_to_search(q: str):
+        with track_queries() as log:
+            found = await index.search(db, q, 20, 0)
+        return log.total, found
+
+    async def scenario():
+        product = Product(name="Indexed amber serum", price=20)
+        db.add(product)
+        await db.commit()
+        catalog_cache.invalidate()
+
+        assert await statements_to_search("amber serum") == (1, [product.id])
+        assert await statements_to_search("amber") == (0, [product.id])
+
+        # Checkouts only move stock, which the index doesn't hold
+        catalog_cache.invalidate(stock_only=True)
+        assert (await statements_to_search("amber"))[0] == 0
+
+        product.name = "Indexed citrus serum"
+        await db.commit()
+        catalog_cache.invalidate()
+        assert await statements_to_search("citrus") == (1, [product.id])
+
+        # Writes by other workers are picked up once the TTL runs out
+        index.expires_at = 0
+        assert (await statements_to_search("citrus"))[0] == 1
+
+    run(scenario())
@@ -0,0 +1,47 @@
+from app.config import firebase_auth
+from app.config.firebase_auth import TokenCache
+
+
+class Clock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+def test_entries_expire_at_exp_or_max_ttl_whichever_is_first(monkeypatch):
+    clock = Clock(1000.0)
+    monkeypatch.setattr(firebase_auth.time, "time", clock.time)
+    cache = TokenCache(max_size=10, max_ttl=300)
+
+    cache.put("short", {"uid": "a", "exp": 1060})
+    cache.put("long", {"uid": "b", "exp": 5000})
+    cache.put("expired", {"uid": "c", "exp": 999})
+    assert cache.get("expired") is None
+
+    clock.now = 1059
+    assert cache.get("short") == {"uid": "a", "exp": 1060}
+    clock.now = 1060
+    assert cache.get("short") is None
+
+    clock.now = 1299
+    assert cache.get("long")["uid"] == "b"
+    clock.now = 1300
+    assert cache.get("long") is None
+
+    assert cache.stats() == {"size": 0, "hits": 2, "misses": 3}
+
+
+def test_evicts_the_least_recently_used_token(monkeypatch):
+    monkeypatch.setattr(firebase_auth.time, "time", Clock(1000.0).time)
+    cache = TokenCache(max_size=2, max_ttl=300)
+
+    cache.put("first", {"uid": "1", "exp": 2000})
+    cache.put("second", {"uid": "2", "exp": 2000})
+    assert cache.get("first")["uid"] == "1"
+    cache.put("third", {"uid": "3", "exp": 2000})
+
+    assert cache.get("second") is None
+    assert [cache.get(token)["uid"] for token in ("first", "third")] == ["1", "3"]
+    assert cache.stats() == {"size": 2, "hits": 3, "misses": 1}
@@ -0,0 +1,131 @@
+import json
+import time
+import base64
+import datetime
+import threading
+
+import pytest
+from cryptography import x509
+from cryptography.x509.oid import NameOID
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from google.auth import crypt, jwt
+
+from app.config.firebase_auth import TokenVerifier, InvalidTokenError, ExpiredTokenError
+
+PROJECT = "elavid-test"
+ISSUER = f"https://securetoken.google.com/{PROJECT}"
+
+
+def signing_key():
+    """A fresh RSA key and the PEM self-signed certificate a key set would hold for it"""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "securetoken.test")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name).issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    return private_pem, cert.public_bytes(serialization.Encoding.PEM).decode()
+
+
+@pytest.fixture(scope="module")
+def keys():
+    return {"current": signing_key(), "stranger": signing_key()}
+
+
+@pytest.fixture
+def verifier(keys, tmp_path):
+    keyset = tmp_path / "keyset.json"
+    keyset.write_text(json.dumps({"current": keys["current"][1]}))
+    verifier = TokenVerifier(max_workers=1)
+    verifier.start(project_id=PROJECT, keyset_file=str(keyset))
+    return verifier
+
+
+def token(keys, key="current", kid="current", **overrides):
+    now = int(time.time())
+    claims = {"iss": ISSUER, "aud": PROJECT, "sub": "user-1", "iat": now - 10, "exp": now + 3600, **overrides}
+    return jwt.encode(crypt.RSASigner.from_string(keys[key][0], key_id=kid), claims).decode()
+
+
+def test_accepts_a_valid_token(verifier, keys):
+    claims = verifier.verify(token(keys))
+    assert (claims["uid"], claims["aud"]) == ("user-1", PROJECT)
+
+
+def test_expired_token(verifier, keys):
+    now = int(time.time())
+    with pytest.raises(ExpiredTokenError):
+        verifier.verify(token(keys, iat=now - 7200, exp=now - 3600))
+
+
+@pytest.mark.parametrize("overrides", [
+    {"iat": int(time.time()) + 600},
+    {"aud": "another-project"},
+    {"iss": "https://securetoken.google.com/another-project"},
+    {"sub": ""},
+    {"sub": "u" * 129},
+], ids=["future-iat", "wrong-aud", "wrong-iss", "empty-sub", "long-sub"])
+def test_rejects_bad_claims(verifier, keys, overrides):
+    with pytest.raises(InvalidTokenError) as error:
+        verifier.verify(token(keys, **overrides))
+    assert not isinstance(error.value, ExpiredTokenError)
+
+
+@pytest.mark.parametrize("key, kid", [
+    ("current", "unknown"),
+    ("current", None),
+    ("stranger", "current"),
+], ids=["unknown-kid", "missing-kid", "wrong-signature"])
+def test_rejects_tokens_not_signed_by_a_known_key(verifier, keys, key, kid):
+    with pytest.raises(InvalidTokenError):
+        verifier.verify(token(keys, key=key, kid=kid))
+
+
+def test_rejects_other_algorithms(verifier, keys):
+    header, payload, signature = token(keys).split(".")
+    forged = base64.urlsafe_b64encode(json.dumps({"alg": "HS256", "kid": "current"}).encode()).rstrip(b"=").decode()
+    with pytest.raises(InvalidTokenError, match="RS256"):
+        verifier.verify(f"{forged}.{payload}.{signature}")
+    with pytest.raises(InvalidTokenError, match="Malformed"):
+        verifier.verify("not a token")
+
+
+def test_unknown_kids_refresh_the_key_set_once(verifier, keys, monkeypatch):
+    loads = []
+    load_keys = verifier._load_keys
+
+    def slow_load():
+        loads.append(1)
+        time.sleep(0.05)
+        return load_keys()
+
+    monkeypatch.setattr(verifier, "_load_keys", slow_load)
+    verifier._refreshed_at = 0.0
+    rotated = token(keys, kid="rotated")
+    start = threading.Barrier(8)
+    errors = []
+
+    def verify():
+        start.wait()
+        try:
+            verifier.verify(rotated)
+        except InvalidTokenError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=verify) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(errors) == 8
+    assert len(loads) == 1
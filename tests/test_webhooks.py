@@ -0,0 +1,69 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, func, update
+
+from app.models.webhook_event import WebhookEvent
+from app.services import webhook_service
+from app.services.payment_service import PaymentService
+from app.services.webhook_service import WebhookService
+from test_query_budgets import signed_webhook
+
+
+def utc(moment: datetime) -> datetime:
+    # SQLite hands timestamps back without their zone; they're stored in UTC
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def test_failing_event_backs_off_then_gives_up(run, db, monkeypatch):
+    async def broken_fulfilment(db, session):
+        raise RuntimeError("stripe metadata unreadable")
+
+    monkeypatch.setattr(PaymentService, "handle_checkout_completed", broken_fulfilment)
+    monkeypatch.setattr(webhook_service, "MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(webhook_service.random, "uniform", lambda low, high: high)
+
+    async def event():
+        db.expire_all()
+        return await db.get(WebhookEvent, "evt_backoff")
+
+    async def scenario():
+        payload = json.dumps({"id": "evt_backoff", "type": "checkout.session.completed", "data": {"object": {}}})
+        assert await WebhookService.store_event(db, "evt_backoff", "checkout.session.completed", payload.encode())
+
+        for attempt, delay in ((1, 2), (2, 4)):
+            started = datetime.now(timezone.utc)
+            assert await WebhookService.process_next(db)
+            stored = await event()
+            assert (stored.status, stored.attempts, stored.last_error) == ("pending", attempt, "stripe metadata unreadable")
+            waited = (utc(stored.next_attempt_at) - started).total_seconds()
+            assert delay - 1 < waited <= delay + 1
+
+            # Not claimed again before it's due
+            assert not await WebhookService.process_next(db)
+            await db.execute(
+                update(WebhookEvent).filter(WebhookEvent.id == "evt_backoff")
+                .values(next_attempt_at=datetime.now(timezone.utc) - timedelta(seconds=1))
+            )
+            await db.commit()
+
+        assert await WebhookService.process_next(db)
+        assert ((await event()).status, (await event()).attempts) == ("failed", 3)
+        assert not await WebhookService.process_next(db)
+
+    run(scenario())
+
+
+def test_redelivered_event_is_stored_once(run, client, db, monkeypatch):
+    notified = []
+    monkeypatch.setattr(webhook_service.webhook_workers, "notify", lambda: notified.append(1))
+    body, headers = signed_webhook({"id": "cs_redelivered", "metadata": {}})
+
+    async def scenario():
+        for _ in range(3):
+            response = await client.post("/api/v1/payments/webhook/stripe", content=body, headers=headers)
+            assert response.status_code == 200
+        stored = await db.scalar(select(func.count()).select_from(WebhookEvent).filter(WebhookEvent.id == "evt_cs_redelivered"))
+        assert (stored, len(notified)) == (1, 1)
+
+    run(scenario())